@@ -50,6 +50,9 @@ class Estimators(object):
         propagation and itcf calculation.
     calc_itcf : bool
         True if calculating imaginary time correlation functions (ITCFs).
+    store_history : bool
+        True if walkers need to store historic wavefunctions and auxiliary
+        field configurations, i.e., for back propagation or ITCFs.
     """
 
     def __init__(self, estimates, root, qmc, system, trial, BT2, verbose=False):
@@ -70,7 +73,12 @@ class Estimators(object):
         # 1. Back-propagation
         mixed = estimates.get('mixed', {})
         self.estimators = {}
-        dtype = complex
+        # Estimates are only complex if the propagation is, see
+        # :meth:`pauxy.qmc.afqmc.AFQMC.determine_dtype`.
+        if qmc.cplx:
+            dtype = complex
+        else:
+            dtype = float
         self.estimators['mixed'] = Mixed(mixed, root, self.h5f,
                                          qmc, trial, dtype)
         bp = estimates.get('back_propagated', None)
@@ -92,6 +100,7 @@ class Estimators(object):
                                            system.nbasis, dtype,
                                            self.nprop_tot, BT2)
             self.nprop_tot = self.estimators['itcf'].nprop_tot
+        self.store_history = self.back_propagation or self.calc_itcf
 
     def print_step(self, comm, nprocs, step, nmeasure):
         """Print QMC estimates.
@@ -51,6 +51,11 @@ class Mixed(object):
         Class for outputting data to HDF5 group.
     output : :class:`pauxy.estimators.H5EstimatorHelper`
         Class for outputting rdm data to HDF5 group.
+    log_weight_factor : float
+        Log of the global weight factor removed from the walkers by stochastic
+        reconfiguration at the start of the current block. Walker weights are
+        rescaled relative to this so that all steps of a block share the same
+        normalisation.
     """
 
     def __init__(self, mixed, root, h5f, qmc, trial, dtype):
@@ -90,6 +95,22 @@ class Mixed(object):
                                                    (self.nmeasure + 1,) +
                                                    self.G.shape,
                                                    dtype)
+        self.log_weight_factor = None
+        self.last_log_weight_factor = 0.0
+        self.stochastic_reconfiguration = (
+            qmc.pop_control_method == 'stochastic_reconfiguration'
+        )
+        if root and self.stochastic_reconfiguration:
+            self.key['log_weight_factor'] = (
+                "Log of global weight factor removed by stochastic "
+                "reconfiguration."
+            )
+            self.weight_factor_output = H5EstimatorHelper(energies,
+                                                          'log_weight_factor',
+                                                          (self.nmeasure + 1,),
+                                                          float)
+        if qmc.batched:
+            self.update = self.update_batch
 
     def update(self, system, qmc, trial, psi, step, free_projection=False):
         """Update mixed estimates for walkers.
@@ -109,31 +130,97 @@ class Mixed(object):
         free_projection : bool
             True if doing free projection.
         """
+        wfac = self.weight_factor(psi)
         if not free_projection:
             # When using importance sampling we only need to know the current
             # walkers weight as well as the local energy, the walker's overlap
-            # with the trial wavefunction is not needed.
+            # with the trial wavefunction is not needed. The Green's function
+            # and local energy are cached on the walker and only recomputed if
+            # the walker has been modified since they were last evaluated.
             for i, w in enumerate(psi.walkers):
-                w.greens_function(trial)
+                if w.dirty:
+                    w.greens_function(trial)
                 E, T, V = w.local_energy(system)
+                weight = wfac * w.weight
                 self.estimates[self.names.enumer] += (
-                        w.weight*E.real
+                        weight*E.real
                 )
                 self.estimates[self.names.ekin:self.names.epot+1] += (
-                        w.weight*numpy.array([T,V]).real
+                        weight*numpy.array([T,V]).real
                 )
-                self.estimates[self.names.weight] += w.weight
-                self.estimates[self.names.edenom] += w.weight
+                self.estimates[self.names.weight] += weight
+                self.estimates[self.names.edenom] += weight
                 if self.rdm:
-                    self.estimates[self.names.time+1:] += w.weight*w.G.flatten().real
+                    self.estimates[self.names.time+1:] += weight*w.G.flatten().real
         else:
             for i, w in enumerate(psi.walkers):
-                w.greens_function(trial)
+                if w.dirty:
+                    w.greens_function(trial)
                 E, T, V = w.local_energy(system)
-                self.estimates[self.names.enumer] += w.weight*E*w.ot
-                self.estimates[self.names.ekin:self.names.epot+1] += w.weight*numpy.array([T,V])*w.ot
-                self.estimates[self.names.weight] += w.weight
-                self.estimates[self.names.edenom] += (w.weight*w.ot)
+                weight = wfac * w.weight
+                self.estimates[self.names.enumer] += weight*E*w.ot
+                self.estimates[self.names.ekin:self.names.epot+1] += weight*numpy.array([T,V])*w.ot
+                self.estimates[self.names.weight] += weight
+                self.estimates[self.names.edenom] += (weight*w.ot)
+
+    def weight_factor(self, psi):
+        """Global weight factor removed from walkers during the current block.
+
+        Parameters
+        ----------
+        psi : :class:`pauxy.walkers.Walkers` object
+            CPMC wavefunction.
+
+        Returns
+        -------
+        wfac : float
+            Factor multiplying walker weights, exp(log_weight_factor) relative
+            to its value at the start of the block. One unless using
+            stochastic reconfiguration.
+        """
+        if self.log_weight_factor is None:
+            self.log_weight_factor = psi.log_weight_factor
+        self.last_log_weight_factor = psi.log_weight_factor
+        return numpy.exp(psi.log_weight_factor - self.log_weight_factor)
+
+    def update_batch(self, system, qmc, trial, psi, step,
+                     free_projection=False):
+        """Update mixed estimates for batch of walkers.
+
+        Parameters
+        ----------
+        system : system object.
+            Container for model input options.
+        qmc : :class:`pauxy.state.QMCOpts` object.
+            Container for qmc input options.
+        trial : :class:`pauxy.trial_wavefunction.X' object
+            Trial wavefunction class.
+        psi : :class:`pauxy.walkers.batch.WalkerBatch` object
+            CPMC wavefunction.
+        step : int
+            Current simulation step
+        free_projection : bool
+            True if doing free projection.
+        """
+        psi.update_greens_function(trial)
+        (E, T, V) = psi.local_energy(system)
+        weight = self.weight_factor(psi) * psi.weight
+        if not free_projection:
+            self.estimates[self.names.enumer] += numpy.dot(weight, E.real)
+            self.estimates[self.names.ekin] += numpy.dot(weight, T.real)
+            self.estimates[self.names.epot] += numpy.dot(weight, V.real)
+            self.estimates[self.names.weight] += numpy.sum(weight)
+            self.estimates[self.names.edenom] += numpy.sum(weight)
+            if self.rdm:
+                G = psi.G.reshape(len(weight), -1)
+                self.estimates[self.names.time+1:] += numpy.dot(weight, G.real)
+        else:
+            wot = weight * psi.ot
+            self.estimates[self.names.enumer] += numpy.dot(wot, E)
+            self.estimates[self.names.ekin] += numpy.dot(wot, T)
+            self.estimates[self.names.epot] += numpy.dot(wot, V)
+            self.estimates[self.names.weight] += numpy.sum(weight)
+            self.estimates[self.names.edenom] += numpy.sum(wot)
 
     def print_step(self, comm, nprocs, step, nmeasure):
         """Print mixed estimates to file.
@@ -168,6 +255,8 @@ class Mixed(object):
             if self.rdm:
                 rdm = self.global_estimates[self.nreg:].reshape(self.G.shape)
                 self.dm_output.push(rdm/denom/nmeasure)
+            if self.stochastic_reconfiguration:
+                self.weight_factor_output.push(self.last_log_weight_factor)
         self.zero()
 
     def print_key(self, eol='', encode=False):
@@ -229,6 +318,8 @@ class Mixed(object):
         self.estimates[:] = 0
         self.global_estimates[:] = 0
         self.estimates[self.names.time] = time.time()
+        # The next block is normalised relative to the current weight factor.
+        self.log_weight_factor = None
 
 # Energy evaluation routines.
 
@@ -257,6 +348,27 @@ def local_energy(system, G):
         return local_energy_generic(system, G)
 
 
+def local_energy_batch(system, G):
+    """Helper routine to compute local energies for a batch of walkers.
+
+    Parameters
+    ----------
+    system : system object
+        system object.
+    G : :class:`numpy.ndarray`
+        Stacked 1RDMs of shape (nwalkers, 2, nbasis, nbasis).
+
+    Returns
+    -------
+    (E,T,V) : tuple
+        Arrays containing total, one-body and two-body energy of each walker.
+    """
+    if system.name == "Hubbard":
+        return local_energy_hubbard_batch(system, G)
+    else:
+        return local_energy_generic_batch(system, G)
+
+
 def local_energy_hubbard(system, G):
     r"""Calculate local energy of walker for the Hubbard model.
 
@@ -279,6 +391,32 @@ def local_energy_hubbard(system, G):
     return (ke + pe, ke, pe)
 
 
+def local_energy_hubbard_batch(system, G):
+    r"""Calculate local energies of a batch of walkers for the Hubbard model.
+
+    Parameters
+    ----------
+    system : :class:`Hubbard`
+        System information for the Hubbard model.
+    G : :class:`numpy.ndarray`
+        Walkers' "Green's functions" of shape (nwalkers, 2, nbasis, nbasis).
+
+    Returns
+    -------
+    (E_L(phi), T, V): tuple
+        Arrays of local, kinetic and potential energies of each walker.
+    """
+    ke = (numpy.einsum('ij,wij->w', system.T[0], G[:,0]) +
+          numpy.einsum('ij,wij->w', system.T[1], G[:,1]))
+    # numpy.diagonal returns a view so there should be no overhead in creating
+    # temporary arrays.
+    gup = numpy.diagonal(G[:,0], axis1=1, axis2=2)
+    gdown = numpy.diagonal(G[:,1], axis1=1, axis2=2)
+    pe = system.U * numpy.einsum('wi,wi->w', gup, gdown)
+
+    return (ke + pe, ke, pe)
+
+
 def local_energy_ghf(system, Gi, weights, denom):
     """Calculate local energy of GHF walker for the Hubbard model.
 
@@ -399,6 +537,37 @@ def local_energy_generic(system, G):
     e2 = euu + edd + eud + edu
     return (e1+e2+system.ecore, e1+system.ecore, e2)
 
+def local_energy_generic_batch(system, G):
+    r"""Calculate local energies of a batch of walkers for generic hamiltonian.
+
+    This uses the full form for the two-electron integrals.
+
+    Parameters
+    ----------
+    system : :class:`Generic`
+        System information for the generic system.
+    G : :class:`numpy.ndarray`
+        Walkers' "green's functions" of shape (nwalkers, 2, nbasis, nbasis).
+
+    Returns
+    -------
+    (E, T, V): tuple
+        Arrays of local, kinetic and potential energies of each walker.
+    """
+    e1 = (numpy.einsum('ij,wji->w', system.T[0], G[:,0]) +
+          numpy.einsum('ij,wji->w', system.T[1], G[:,1]))
+    # Coulomb and exchange like contractions for each pair of spin sectors.
+    Gtot = G[:,0] + G[:,1]
+    ecoul = 0.5*numpy.einsum('pqrs,wpr,wqs->w', system.h2e, Gtot, Gtot,
+                             optimize=True)
+    exx = 0.5*(numpy.einsum('pqrs,wps,wqr->w', system.h2e, G[:,0], G[:,0],
+                            optimize=True) +
+               numpy.einsum('pqrs,wps,wqr->w', system.h2e, G[:,1], G[:,1],
+                            optimize=True))
+    e2 = ecoul - exx
+    return (e1+e2+system.ecore, e1+system.ecore, e2)
+
+
 def local_energy_generic_cholesky(system, G):
     r"""Calculate local for generic two-body hamiltonian.
 
@@ -1,9 +1,10 @@
 import cmath
+import copy
 import math
 import numpy
 import scipy.linalg
-from pauxy.propagation.operations import kinetic_real
-from pauxy.utils.linalg import exponentiate_matrix
+from pauxy.propagation.operations import kinetic_real, kinetic_real_batch
+from pauxy.utils.linalg import exponentiate_matrix, apply_exponential
 from pauxy.walkers.single_det import SingleDetWalker
 
 class GenericContinuous(object):
@@ -32,6 +33,12 @@ class GenericContinuous(object):
         self.hs_type = 'continuous'
         self.free_projection = options.get('free_projection', False)
         self.exp_nmax = options.get('expansion_order', 6)
+        # If set the expansion is truncated once the bound on the next term
+        # falls below this tolerance (with exp_nmax the maximum order).
+        self.exp_tol = options.get('expansion_tolerance', None)
+        # Only propagate a single spin sector of closed shell walkers, see
+        # :class:`pauxy.walkers.rhf.RHFWalker`.
+        self.restricted = qmc.spin_restricted
         # Derived Attributes
         self.dt = qmc.dt
         self.sqrt_dt = qmc.dt**0.5
@@ -46,18 +53,19 @@ class GenericContinuous(object):
         self.mf_const_fac = cmath.exp(-self.dt*mf_core)
         self.BT_BP = self.BH1
         self.nstblz = qmc.nstblz
-        # Temporary array for matrix exponentiation.
-        self.Temp = numpy.zeros(trial.psi[:,:system.nup].shape,
-                                dtype=trial.psi.dtype)
         # Half rotated cholesky vectors (by trial wavefunction).
         # Assuming nup = ndown here
         rotated_up = numpy.einsum('rp,lpq->lrq',
                                   trial.psi[:,:system.nup].conj().T,
                                   system.chol_vecs)
-        rotated_down = numpy.einsum('rp,lpq->lrq',
-                                    trial.psi[:,system.nup:].conj().T,
-                                    system.chol_vecs)
-        self.rchol_vecs = numpy.array([rotated_up, rotated_down])
+        if self.restricted:
+            # Both spin sectors contribute equally to the force bias.
+            self.rchol_vecs = numpy.array([2*rotated_up])
+        else:
+            rotated_down = numpy.einsum('rp,lpq->lrq',
+                                        trial.psi[:,system.nup:].conj().T,
+                                        system.chol_vecs)
+            self.rchol_vecs = numpy.array([rotated_up, rotated_down])
         self.chol_vecs = system.chol_vecs
         self.ebound = (2.0/self.dt)**0.5
         self.mean_local_energy = 0
@@ -65,6 +73,15 @@ class GenericContinuous(object):
             self.propagate_walker = self.propagate_walker_free
         else:
             self.propagate_walker = self.propagate_walker_phaseless
+        if qmc.batched and not self.free_projection:
+            # Matrix forms of (half rotated) cholesky vectors so that force
+            # bias and HS potential for a block of walkers are single GEMMs.
+            nchol = system.nchol_vec
+            self.rchol_vecs_mat = (
+                self.rchol_vecs.transpose(1,0,2,3).reshape(nchol,-1).copy()
+            )
+            self.chol_vecs_mat = system.chol_vecs.reshape(nchol,-1)
+            self.propagate_walker_batch = self.propagate_walker_batch_phaseless
         if verbose:
             print ("# Finished setting up propagator.")
 
@@ -84,8 +101,13 @@ class GenericContinuous(object):
         """
         shift = 1j*numpy.einsum('l,lpq->pq', self.mf_shift, chol_vecs)
         H1 = h1e_mod - numpy.array([shift,shift])
-        self.BH1 = numpy.array([scipy.linalg.expm(-0.5*dt*H1[0]),
-                                scipy.linalg.expm(-0.5*dt*H1[1])])
+        if self.restricted:
+            # Spin independent, only the spin up sector is propagated.
+            B = scipy.linalg.expm(-0.5*dt*H1[0])
+            self.BH1 = numpy.array([B, B])
+        else:
+            self.BH1 = numpy.array([scipy.linalg.expm(-0.5*dt*H1[0]),
+                                    scipy.linalg.expm(-0.5*dt*H1[1])])
 
     def construct_force_bias(self, Gmod):
         """Compute optimal force bias.
@@ -95,7 +117,8 @@ class GenericContinuous(object):
         Parameters
         ----------
         Gmod : :class:`numpy.ndarray`
-            Half-rotated walker's Green's function.
+            Half-rotated walker's Green's function. Only contains the spin up
+            sector for spin restricted walkers.
 
         Returns
         -------
@@ -124,6 +147,25 @@ class GenericContinuous(object):
         vbias += numpy.einsum('lpq,pq->l', self.chol_vecs, G[1])
         return - self.sqrt_dt * (1j*vbias-self.mf_shift)
 
+    def construct_force_bias_batch(self, Gmod):
+        """Compute optimal force bias for a block of walkers.
+
+        Parameters
+        ----------
+        Gmod : :class:`numpy.ndarray`
+            Half-rotated walkers' Green's functions of shape
+            (nwalkers, 2, nbasis, nup).
+
+        Returns
+        -------
+        xbar : :class:`numpy.ndarray`
+            Force bias of shape (nwalkers, nchol).
+        """
+        nwalkers = Gmod.shape[0]
+        G = Gmod.transpose(0,1,3,2).reshape(nwalkers,-1)
+        vbias = 1j*G.dot(self.rchol_vecs_mat.T)
+        return - self.sqrt_dt * (vbias-self.mf_shift)
+
     def two_body(self, walker, system, trial):
         r"""Apply continuous Hubbard-Statonovich transformation for Hubbard model.
 
@@ -151,9 +193,8 @@ class GenericContinuous(object):
         c_fb = cmath.exp(xi.dot(xbar)-0.5*xbar.dot(xbar))
         # Operator terms contributing to propagator.
         VHS = self.isqrt_dt*numpy.einsum('l,lpq->pq', shifted, system.chol_vecs)
-        # Apply propagator
-        self.apply_exponential(walker.phi[:,:system.nup], VHS)
-        self.apply_exponential(walker.phi[:,system.nup:], VHS)
+        # Apply propagator, both spin sectors see the same potential.
+        self.apply_exponential(walker.phi, VHS)
 
         return (c_mf, c_fb, shifted)
 
@@ -173,13 +214,69 @@ class GenericContinuous(object):
         if debug:
             copy = numpy.copy(phi)
             c2 = scipy.linalg.expm(VHS).dot(copy)
-        numpy.copyto(self.Temp, phi)
-        for n in range(1, self.exp_nmax+1):
-            self.Temp = VHS.dot(self.Temp) / n
-            phi += self.Temp
+        apply_exponential(phi, VHS, self.exp_nmax, self.exp_tol)
         if debug:
             print("DIFF: {: 10.8e}".format((c2 - phi).sum() / c2.size))
 
+    def two_body_batch(self, psi, index, system, trial):
+        r"""Apply continuous HS transformation to a block of walkers.
+
+        Parameters
+        ----------
+        psi : :class:`pauxy.walkers.batch.WalkerBatch`
+            Walkers. On output we have acted on psi.phi[index] by B_V(x).
+        index : slice or :class:`numpy.ndarray`
+            Indices of walkers to propagate.
+        system : :class:`pauxy.system.System`
+            System object.
+        trial : :class:`pauxy.trial_wavefunctioin.Trial`
+            Trial wavefunction object.
+
+        Returns
+        -------
+        (c_mf, c_fb, shifted) : tuple
+            Mean field and force bias factors and shifted fields for each
+            walker.
+        """
+        nwalkers = len(psi.weight[index])
+        nbasis = system.nbasis
+        # Construct walkers' modified Green's functions (without Psi_T).
+        psi.inverse_overlap(trial, index)
+        psi.rotated_greens_function(index)
+        # Normally distrubted auxiliary fields.
+        xi = numpy.random.normal(0.0, 1.0, (nwalkers, system.nchol_vec))
+        # Optimal force bias.
+        xbar = self.construct_force_bias_batch(psi.Gmod[index])
+        # Shifted auxiliary fields.
+        shifted = xi - xbar
+        # Constant factor arising from force bias and mean field shift
+        c_mf = numpy.exp(-self.sqrt_dt*shifted.dot(self.mf_shift))
+        # Constant factor arising from shifting the propability distribution.
+        c_fb = numpy.exp(numpy.einsum('wl,wl->w', xi, xbar)
+                         - 0.5*numpy.einsum('wl,wl->w', xbar, xbar))
+        # Operator terms contributing to propagator.
+        VHS = self.isqrt_dt*shifted.dot(self.chol_vecs_mat)
+        VHS = VHS.reshape(nwalkers, nbasis, nbasis)
+        # Apply propagator, both spin sectors see the same potential.
+        phi = psi.phi[index]
+        self.apply_exponential_batch(phi, VHS)
+        psi.phi[index] = phi
+
+        return (c_mf, c_fb, shifted)
+
+    def apply_exponential_batch(self, phi, VHS):
+        """Apply matrix expoential to a block of wavefunctions approximately.
+
+        Parameters
+        ----------
+        phi : :class:`numpy.ndarray`
+            Walkers' wavefunctions of shape (nwalkers, nbasis, ne). On output
+            phi[i] = exp(VHS[i])*phi[i].
+        VHS : :class:`numpy.ndarray`
+            Hubbard Stratonovich matrices of shape (nwalkers, nbasis, nbasis).
+        """
+        apply_exponential(phi, VHS, self.exp_nmax, self.exp_tol)
+
     def propagate_walker_free(self, walker, system, trial):
         r"""Free projection for continuous HS transformation.
 
@@ -245,15 +342,67 @@ class GenericContinuous(object):
 
         # Now apply hybrid phaseless approximation
         walker.inverse_overlap(trial.psi)
-        ot_new = walker.calc_otrial(trial.psi)
+        log_ot_new = walker.calc_log_otrial(trial)
         # Walker's phase.
-        importance_function = self.mf_const_fac*cmf*cfb*ot_new / walker.ot
+        importance_function = (self.mf_const_fac*cmf*cfb *
+                               cmath.exp(log_ot_new-walker.log_ot))
         dtheta = cmath.phase(importance_function)
         cfac = max(0, math.cos(dtheta))
         rweight = abs(importance_function)
         walker.weight *= rweight * cfac
-        walker.ot = ot_new
-        walker.field_configs.push_full(xmxbar, cfac, importance_function/rweight)
+        walker.log_ot = log_ot_new
+        walker.invalidate()
+        if walker.field_configs is not None:
+            walker.field_configs.push_full(xmxbar, cfac,
+                                           importance_function/rweight)
+
+    def propagate_walker_batch_phaseless(self, psi, system, trial):
+        r"""Propagate block of walkers using phaseless approximation.
+
+        Batched equivalent of :meth:`propagate_walker_phaseless`.
+
+        Parameters
+        ----------
+        psi : :class:`pauxy.walkers.batch.WalkerBatch`
+            Walkers to be updated. On output we have acted on each active
+            walker with the propagator B(x), and updated the weights
+            appropriately. Updates inplace.
+        system : :class:`pauxy.system.System`
+            System object.
+        trial : :class:`pauxy.trial_wavefunctioin.Trial`
+            Trial wavefunction object.
+        """
+        index = psi.active_walkers()
+        if len(psi.weight[index]) == 0:
+            return
+        # 1. Apply one_body propagator.
+        phi = psi.phi[index]
+        kinetic_real_batch(phi, system, self.BH1)
+        psi.phi[index] = phi
+        # 2. Apply two_body propagator.
+        (cmf, cfb, xmxbar) = self.two_body_batch(psi, index, system, trial)
+        # 3. Apply one_body propagator.
+        phi = psi.phi[index]
+        kinetic_real_batch(phi, system, self.BH1)
+        psi.phi[index] = phi
+
+        # Now apply hybrid phaseless approximation
+        psi.inverse_overlap(trial, index)
+        log_ot_new = psi.calc_log_otrial(trial, index)
+        # Walkers' phases.
+        importance_function = (self.mf_const_fac*cmf*cfb *
+                               numpy.exp(log_ot_new-psi.log_ot[index]))
+        dtheta = numpy.angle(importance_function)
+        cfac = numpy.maximum(0, numpy.cos(dtheta))
+        rweight = numpy.abs(importance_function)
+        psi.weight[index] *= rweight * cfac
+        psi.log_ot[index] = log_ot_new
+        psi.invalidate(index)
+        if psi.history:
+            wfac = importance_function / rweight
+            for (i, iw) in enumerate(numpy.arange(psi.nw)[index]):
+                psi.walkers[iw].field_configs.push_full(xmxbar[i], cfac[i],
+                                                        wfac[i])
 
 def construct_propagator_matrix_generic(system, BT2, config, dt, conjt=False):
     """Construct the full projector from a configuration of auxiliary fields.
@@ -312,17 +461,22 @@ def back_propagate(system, psi, trial, nstblz, BT2, dt):
     psi_bp : list of :class:`pauxy.walker.Walker` objects
         Back propagated list of walkers.
     """
-    psi_bp = [SingleDetWalker(1,system,trial,w) for w in range(len(psi))]
+    # All back propagated walkers start from the trial wavefunction.
+    wbp = SingleDetWalker(1, system, trial, history=False)
+    psi_bp = [copy.deepcopy(wbp) for w in range(len(psi))]
     nup = system.nup
     for (iw, w) in enumerate(psi):
         # propagators should be applied in reverse order
         for (i, c) in enumerate(w.field_configs.get_block()[0][::-1]):
-            # could make this system specific to reduce need for multiple
-            # routines.
-            B = construct_propagator_matrix_generic(system, BT2,
-                                                    c, dt, conjt=True)
-            psi_bp[iw].phi[:,:nup] = B[0].dot(psi_bp[iw].phi[:,:nup])
-            psi_bp[iw].phi[:,nup:] = B[1].dot(psi_bp[iw].phi[:,nup:])
+            # B^dagger = BT2^dagger exp(VHS^dagger) BT2^dagger is applied
+            # directly to the wavefunction rather than formed explicitly.
+            VHS = 1j*dt**0.5*numpy.einsum('l,lpq->pq', c, system.chol_vecs)
+            phi = psi_bp[iw].phi
+            phi[:,:nup] = BT2[0].conj().T.dot(phi[:,:nup])
+            phi[:,nup:] = BT2[1].conj().T.dot(phi[:,nup:])
+            apply_exponential(phi, VHS.conj().T)
+            phi[:,:nup] = BT2[0].conj().T.dot(phi[:,:nup])
+            phi[:,nup:] = BT2[1].conj().T.dot(phi[:,nup:])
             if i != 0 and i % nstblz == 0:
                 psi_bp[iw].reortho(trial)
     return psi_bp
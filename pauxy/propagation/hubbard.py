@@ -3,8 +3,15 @@ import copy
 import numpy
 import math
 import scipy.linalg
-from pauxy.propagation.operations import kinetic_real, local_energy_bound
-from pauxy.utils.fft import fft_wavefunction, ifft_wavefunction
+import warnings
+from pauxy.propagation.operations import (
+    Checkerboard,
+    kinetic_checkerboard,
+    kinetic_ghf,
+    kinetic_real,
+    kinetic_real_batch,
+    local_energy_bound
+)
 from pauxy.utils.linalg import reortho
 from pauxy.walkers.multi_ghf import MultiGHFWalker
 from pauxy.walkers.single_det import SingleDetWalker
@@ -45,30 +52,58 @@ class Discrete(object):
         self.btk = numpy.exp(-0.5*qmc.dt*system.eks)
         self.hs_type = 'discrete'
         self.free_projection = options.get('free_projection', False)
+        # Number of single site updates to accumulate before updating the
+        # walker's inverse overlap matrix.
+        self.ndelay = options.get('delayed_updates', 1)
         self.gamma = numpy.arccosh(numpy.exp(0.5*qmc.dt*system.U))
         self.auxf = numpy.array([[numpy.exp(self.gamma), numpy.exp(-self.gamma)],
                                 [numpy.exp(-self.gamma), numpy.exp(self.gamma)]])
         self.auxf = self.auxf * numpy.exp(-0.5*qmc.dt*system.U)
         self.delta = self.auxf - 1
+        # Auxiliary fields selected during the current step.
+        self.fields = numpy.zeros(system.nbasis, dtype=numpy.int8)
         if self.free_projection:
             self.propagate_walker = self.propagate_walker_free
         else:
             self.propagate_walker = self.propagate_walker_constrained
         if trial.name == 'multi_determinant':
-            if trial.type == 'GHF':
+            if self.ndelay > 1:
+                warnings.warn('Delayed updates are only implemented for '
+                              'single determinant trial wavefunctions. '
+                              'Ignoring delayed_updates = %d.'%self.ndelay)
+                self.ndelay = 1
+            if trial.expansion == 'excitations':
+                self.calculate_overlap_ratio = calculate_overlap_ratio_multi_det_table
+                self.kinetic = kinetic_ghf
+                self.bkinetic = self.bt2
+                self.update_greens_function = self.update_greens_function_table
+            elif trial.type == 'GHF':
                 self.calculate_overlap_ratio = calculate_overlap_ratio_multi_ghf
                 self.kinetic = kinetic_ghf
+                self.bkinetic = self.bt2
                 self.update_greens_function = self.update_greens_function_ghf
             else:
                 self.calculate_overlap_ratio = calculate_overlap_ratio_multi_det
                 self.kinetic = kinetic_real
+                self.bkinetic = self.bt2
         else:
             self.calculate_overlap_ratio = calculate_overlap_ratio_single_det
             self.update_greens_function = self.update_greens_function_uhf
             if qmc.ffts:
                 self.kinetic = kinetic_kspace
+                self.bkinetic = self.btk
+            elif qmc.checkerboard:
+                self.kinetic = kinetic_checkerboard
+                self.bkinetic = [Checkerboard(T, 0.5*qmc.dt) for T in system.T]
+                self.BT_BP = self.bkinetic
             else:
                 self.kinetic = kinetic_real
+                self.bkinetic = self.bt2
+            if self.ndelay > 1:
+                if verbose:
+                    print("# Using delayed updates with block size %d."
+                          %self.ndelay)
+                self.two_body = self.two_body_delayed
         if verbose:
             print ("# Finished setting up propagator.")
 
@@ -96,7 +131,11 @@ class Discrete(object):
         walker.G[1][i,i] = numpy.dot(udown, q)
 
     def update_greens_function_ghf(self, walker, trial, i, nup):
-        """Update of walker's Green's function for UHF walker.
+        """Update of walker's Green's function for GHF walker.
+
+        The Green's functions are only constructed from scratch at the start
+        of the site loop. Afterwards they are kept up to date by the rank-1
+        updates in :meth:`MultiGHFWalker.update_inverse_overlap`.
 
         Parameters
         ----------
@@ -109,7 +148,27 @@ class Discrete(object):
         nup : int
             Number of up electrons.
         """
-        walker.greens_function(trial)
+        if i == 0:
+            walker.greens_function(trial)
+
+    def update_greens_function_table(self, walker, trial, i, nup):
+        """Update of walker's Green's function for multi-determinant walker.
+
+        Only the Green's function of each determinant on site i is
+        constructed, using the walker's overlap tables.
+
+        Parameters
+        ----------
+        walker : :class:`pauxy.walkers.multi_det_table.MultiDetTableWalker`
+            Walker's wavefunction.
+        trial : :class:`pauxy.trial_wavefunction`
+            Trial wavefunction.
+        i : int
+            Basis index.
+        nup : int
+            Number of up electrons.
+        """
+        walker.site_greens_function(trial, i)
 
     def kinetic_importance_sampling(self, walker, system, trial):
         r"""Propagate by the kinetic term by direct matrix multiplication.
@@ -124,16 +183,16 @@ class Discrete(object):
         trial : :class:`pauxy.trial_wavefunctioin.Trial`
             Trial wavefunction object.
         """
-        self.kinetic(walker.phi, system, self.bt2)
+        self.kinetic(walker.phi, system, self.bkinetic)
         # Update inverse overlap
         walker.inverse_overlap(trial.psi)
         # Update walker weight
-        ot_new = walker.calc_otrial(trial)
-        ratio = (ot_new/walker.ot)
+        log_ot_new = walker.calc_log_otrial(trial)
+        ratio = cmath.exp(log_ot_new-walker.log_ot)
         phase = cmath.phase(ratio)
         if abs(phase) < 0.5*math.pi:
             walker.weight = walker.weight * ratio.real
-            walker.ot = ot_new
+            walker.log_ot = log_ot_new
         else:
             walker.weight = 0.0
 
@@ -154,6 +213,9 @@ class Discrete(object):
         delta = self.delta
         nup = system.nup
         soffset = walker.phi.shape[0] - system.nbasis
+        # Sites after the walker is killed aren't sampled, don't record stale
+        # fields from the previous step for them.
+        self.fields[:] = 0
         for i in range(0, system.nbasis):
             self.update_greens_function(walker, trial, i, nup)
             # Ratio of determinants for the two choices of auxilliary fields
@@ -175,11 +237,95 @@ class Discrete(object):
                 walker.phi[i,:nup] = walker.phi[i,:nup] + vtup
                 walker.phi[i+soffset,nup:] = walker.phi[i+soffset,nup:] + vtdown
                 walker.update_overlap(probs, xi, trial.coeffs)
-                walker.field_configs.push(xi)
+                self.fields[i] = xi
                 walker.update_inverse_overlap(trial, vtup, vtdown, i)
             else:
                 walker.weight = 0
-                return
+                break
+        if walker.field_configs is not None:
+            walker.field_configs.push_step(self.fields)
+
+    def two_body_delayed(self, walker, system, trial):
+        r"""Propagate by potential term using discrete HS transform.
+
+        Uses delayed updates. Accepted single site updates are accumulated and
+        only applied to the walker's inverse overlap matrices as a single rank-k
+        (Woodbury) update every k = ``delayed_updates`` sites. Writing the
+        inverse overlap matrix after j accepted updates as
+
+        .. math::
+            A_j^{-1} = A_0^{-1} - X_j Y_j,
+
+        the diagonal of the Green's function and the Sherman-Morrison vectors
+        required for the next update only cost :math:`O(k N_\sigma)` to
+        evaluate.
+
+        Parameters
+        ----------
+        walker : :class:`pauxy.walker` object
+            Walker object to be updated. On output we have acted on phi by
+            B_V(x) and updated the weight appropriately. Updates inplace.
+        system : :class:`pauxy.system.System`
+            System object.
+        trial : :class:`pauxy.trial_wavefunctioin.Trial`
+            Trial wavefunction object.
+        """
+        delta = self.delta
+        nup = system.nup
+        ndelay = self.ndelay
+        # Sites after the walker is killed aren't sampled, don't record stale
+        # fields from the previous step for them.
+        self.fields[:] = 0
+        psit = [trial.psi[:,:nup].conj(), trial.psi[:,nup:].conj()]
+        phi = [walker.phi[:,:nup], walker.phi[:,nup:]]
+        nel = [system.nup, system.ndown]
+        X = [numpy.zeros((n, ndelay), dtype=walker.phi.dtype) for n in nel]
+        Y = [numpy.zeros((ndelay, n), dtype=walker.phi.dtype) for n in nel]
+        px = [None, None]
+        yu = [None, None]
+        for start in range(0, system.nbasis, ndelay):
+            end = min(start+ndelay, system.nbasis)
+            inv_ovlp = [walker.inv_ovlp[0], walker.inv_ovlp[1]]
+            # Rows of walker and trial wavefunction rotated by inverse overlap
+            # at the start of the block.
+            a = [phi[s][start:end].dot(inv_ovlp[s]) for s in [0,1]]
+            b = [inv_ovlp[s].dot(psit[s][start:end].T) for s in [0,1]]
+            nacc = 0
+            for (j, i) in enumerate(range(start, end)):
+                for s in [0,1]:
+                    px[s] = phi[s][i].dot(X[s][:,:nacc])
+                    yu[s] = Y[s][:nacc].dot(psit[s][i])
+                    walker.G[s][i,i] = a[s][j].dot(psit[s][i]) - px[s].dot(yu[s])
+                # Ratio of determinants for the two choices of auxilliary fields
+                probs = self.calculate_overlap_ratio(walker, delta, trial, i)
+                phaseless_ratio = numpy.maximum(probs.real, [0,0])
+                norm = sum(phaseless_ratio)
+                r = numpy.random.random()
+                if norm > 0:
+                    walker.weight = walker.weight * norm
+                    if r < phaseless_ratio[0]/norm:
+                        xi = 0
+                    else:
+                        xi = 1
+                    for s in [0,1]:
+                        d = delta[xi, s]
+                        ainv_u = b[s][:,j] - X[s][:,:nacc].dot(yu[s])
+                        vt_ainv = d * (a[s][j] - px[s].dot(Y[s][:nacc]))
+                        X[s][:,nacc] = ainv_u / (1.0+d*walker.G[s][i,i])
+                        Y[s][nacc] = vt_ainv
+                        phi[s][i] = phi[s][i] + d*phi[s][i]
+                    nacc += 1
+                    walker.update_overlap(probs, xi, trial.coeffs)
+                    self.fields[i] = xi
+                else:
+                    walker.weight = 0
+                    break
+            for s in [0,1]:
+                walker.inv_ovlp[s] = inv_ovlp[s] - X[s][:,:nacc].dot(Y[s][:nacc])
+            if walker.weight == 0:
+                break
+        if walker.field_configs is not None:
+            walker.field_configs.push_step(self.fields)
 
     def propagate_walker_constrained(self, walker, system, trial):
         r"""Wrapper function for propagation using discrete transformation
@@ -205,6 +351,8 @@ class Discrete(object):
             self.two_body(walker, system, trial)
         if abs(walker.weight.real) > 0:
             self.kinetic_importance_sampling(walker, system, trial)
+        # Only the diagonal of G is kept up to date during the site loop.
+        walker.invalidate()
 
     def propagate_walker_free(self, walker, system, trial):
         r"""Propagate walker without imposing constraint.
@@ -239,7 +387,7 @@ class Discrete(object):
         kinetic_real(walker.phi, system, self.bt2)
         walker.inverse_overlap(trial.psi)
         # Update walker weight
-        walker.ot = walker.calc_otrial(trial.psi)
+        walker.log_ot = walker.calc_log_otrial(trial)
         walker.greens_function(trial)
 
 # todo: stucture is the same for all continuous HS transformations.
@@ -287,8 +435,21 @@ class Continuous(object):
             self.propagate_walker = self.propagate_walker_constrained_continuous
         if qmc.ffts:
             self.kinetic = kinetic_kspace
+            self.kinetic_batch = kinetic_kspace_batch
+            self.bkinetic = self.btk
+        elif qmc.checkerboard:
+            self.kinetic = kinetic_checkerboard
+            self.kinetic_batch = kinetic_checkerboard
+            self.bkinetic = [Checkerboard(T, 0.5*qmc.dt) for T in system.T]
+            self.BT_BP = self.bkinetic
         else:
             self.kinetic = kinetic_real
+            self.kinetic_batch = kinetic_real_batch
+            self.bkinetic = self.bt2
+        if qmc.batched and not self.free_projection:
+            self.propagate_walker_batch = (
+                self.propagate_walker_batch_constrained_continuous
+            )
         if verbose:
             print ("# Finished propagator input options.")
 
@@ -325,6 +486,42 @@ class Continuous(object):
         walker.phi[:,nup:] = numpy.einsum('i,ij->ij', EXP_VHS, walker.phi[:,nup:])
         return c_xf
 
+    def two_body_batch(self, phi, G, system):
+        r"""Continuous Hubbard-Statonovich transformation for a block of walkers.
+
+        Parameters
+        ----------
+        phi : :class:`numpy.ndarray`
+            Walkers' Slater determinants of shape (nwalkers, nbasis, ne). On
+            output we have acted on each by :math:`b_v`. Updates inplace.
+        G : :class:`numpy.ndarray`
+            Walkers' Green's functions used to construct optimal field shift.
+        system : :class:`pauxy.system.System`
+            System object.
+
+        Returns
+        -------
+        c_xf : :class:`numpy.ndarray`
+            Constant factors arising from mean field and auxiliary field shift.
+        """
+        mf = self.mf_shift
+        ifac = self.iut_fac
+        ufac = self.ut_fac
+        nsq = self.mf_nsq
+        # Normally distrubted auxiliary fields.
+        xi = numpy.random.normal(0.0, 1.0, (phi.shape[0], system.nbasis))
+        # Optimal field shift for real local energy approximation.
+        shift = (numpy.diagonal(G[:,0], axis1=1, axis2=2) +
+                 numpy.diagonal(G[:,1], axis1=1, axis2=2) - mf)
+        xi_opt = -ifac*shift
+        sxf = numpy.sum(xi-xi_opt, axis=1)
+        # Propagator for potential term with mean field and auxilary field shift.
+        c_xf = numpy.exp(0.5*ufac*nsq-ifac*mf*sxf)
+        EXP_VHS = numpy.exp(0.5*ufac*(1-2.0*mf)+ifac*(xi-xi_opt))
+        # Diagonal in the site basis so the same for both spin sectors.
+        phi *= EXP_VHS[:,:,None]
+        return c_xf
+
     def propagate_walker_free_continuous(self, walker, system, trial):
         r"""Free projection for continuous HS transformation.
 
@@ -358,7 +555,7 @@ class Continuous(object):
         # 3. Apply kinetic projector.
         kinetic_real(walker.phi, system, self.bt2)
         walker.inverse_overlap(trial.psi)
-        walker.ot = walker.calc_otrial(trial.psi)
+        walker.log_ot = walker.calc_log_otrial(trial)
         walker.greens_function(trial)
         # Constant terms are included in the walker's weight.
         walker.weight = walker.weight * c_xf
@@ -381,11 +578,11 @@ class Continuous(object):
         """
 
         # 1. Apply kinetic projector.
-        self.kinetic(walker.phi, system, self.bt2)
+        self.kinetic(walker.phi, system, self.bkinetic)
         # 2. Apply potential projector.
         cxf = self.two_body(walker, system, trial)
         # 3. Apply kinetic projector.
-        self.kinetic(walker.phi, system, self.bt2)
+        self.kinetic(walker.phi, system, self.bkinetic)
 
         # Now apply phaseless, real local energy approximation
         walker.inverse_overlap(trial.psi)
@@ -394,13 +591,56 @@ class Continuous(object):
         # Check for large population fluctuations
         E_L = local_energy_bound(E_L, self.mean_local_energy,
                                  self.ebound)
-        ot_new = walker.calc_otrial(trial.psi)
+        log_ot_new = walker.calc_log_otrial(trial)
         # Walker's phase.
-        dtheta = cmath.phase(cxf*ot_new/walker.ot)
+        dtheta = cmath.phase(cxf*cmath.exp(log_ot_new-walker.log_ot))
         walker.weight = (walker.weight * math.exp(-0.5*self.dt*(walker.E_L+E_L))
                                        * max(0, math.cos(dtheta)))
         walker.E_L = E_L
-        walker.ot = ot_new
+        walker.log_ot = log_ot_new
+
+    def propagate_walker_batch_constrained_continuous(self, psi, system, trial):
+        r"""Propagate block of walkers using continuous transformation.
+
+        Batched equivalent of :meth:`propagate_walker_constrained_continuous`.
+
+        Parameters
+        ----------
+        psi : :class:`pauxy.walkers.batch.WalkerBatch`
+            Walkers to be updated. On output we have acted on each active
+            walker by B_V(x) and updated the weights appropriately. Updates
+            inplace.
+        system : :class:`pauxy.system.System`
+            System object.
+        trial : :class:`pauxy.trial_wavefunction.Trial`
+            Trial wavefunction object.
+        """
+        index = psi.active_walkers()
+        if len(psi.weight[index]) == 0:
+            return
+        phi = psi.phi[index]
+        # 1. Apply kinetic projector.
+        self.kinetic_batch(phi, system, self.bkinetic)
+        # 2. Apply potential projector.
+        cxf = self.two_body_batch(phi, psi.G[index], system)
+        # 3. Apply kinetic projector.
+        self.kinetic_batch(phi, system, self.bkinetic)
+        psi.phi[index] = phi
+
+        # Now apply phaseless, real local energy approximation
+        psi.inverse_overlap(trial, index)
+        psi.greens_function(trial, index)
+        E_L = psi.local_energy(system, index)[0].real
+        # Check for large population fluctuations
+        E_L = numpy.clip(E_L, self.mean_local_energy-self.ebound,
+                         self.mean_local_energy+self.ebound)
+        log_ot_new = psi.calc_log_otrial(trial, index)
+        # Walkers' phases.
+        dtheta = numpy.angle(cxf*numpy.exp(log_ot_new-psi.log_ot[index]))
+        psi.weight[index] *= (numpy.exp(-0.5*self.dt*(psi.E_L[index]+E_L))
+                              * numpy.maximum(0, numpy.cos(dtheta)))
+        psi.E_L[index] = E_L
+        psi.log_ot[index] = log_ot_new
 
 
 def calculate_overlap_ratio_multi_ghf(walker, delta, trial, i):
@@ -418,20 +658,46 @@ def calculate_overlap_ratio_multi_ghf(walker, delta, trial, i):
         Basis index.
     """
     nbasis = trial.psi.shape[1] // 2
-    for (idx, G) in enumerate(walker.Gi):
-        guu = G[i,i]
-        gdd = G[i+nbasis,i+nbasis]
-        gud = G[i,i+nbasis]
-        gdu = G[i+nbasis,i]
-        walker.R[idx,0] = (
-            (1+delta[0,0]*guu)*(1+delta[0,1]*gdd) - delta[0,0]*gud*delta[0,1]*gdu
-        )
-        walker.R[idx,1] = (
-            (1+delta[1,0]*guu)*(1+delta[1,1]*gdd) - delta[1,0]*gud*delta[1,1]*gdu
+    guu = walker.Gi[:,i,i]
+    gdd = walker.Gi[:,i+nbasis,i+nbasis]
+    gud = walker.Gi[:,i,i+nbasis]
+    gdu = walker.Gi[:,i+nbasis,i]
+    for xi in [0,1]:
+        walker.R[:,xi] = (
+            (1+delta[xi,0]*guu)*(1+delta[xi,1]*gdd)
+            - delta[xi,0]*gud*delta[xi,1]*gdu
         )
     R = numpy.einsum('i,ij,i->j',trial.coeffs,walker.R,walker.ots)/walker.ot
     return 0.5 * numpy.array([R[0],R[1]])
 
+def calculate_overlap_ratio_multi_det_table(walker, delta, trial, i):
+    """Calculate overlap ratio for single site update with multi-det trial.
+
+    Uses the per determinant Green's functions on site i constructed from the
+    walker's overlap tables. These are weighted by each determinant's overlap
+    so the new overlaps, stored in walker.R, are well defined even if the
+    walker has zero overlap with some determinants.
+
+    Parameters
+    ----------
+    walker : walker object
+        Walker to be updated.
+    delta : :class:`numpy.ndarray`
+        Delta updates for single spin flip.
+    trial : trial wavefunctio object
+        Trial wavefunction.
+    i : int
+        Basis index.
+    """
+    G = walker.Gsite
+    for xi in [0,1]:
+        walker.R[:,xi] = (
+            walker.ots + delta[xi,0]*G[:,0,0] + delta[xi,1]*G[:,1,1]
+            + delta[xi,0]*delta[xi,1]*walker.Gsite_det
+        )
+    R = numpy.einsum('i,ij->j',trial.coeffs,walker.R)/walker.ot
+    return 0.5 * numpy.array([R[0],R[1]])
+
 def calculate_overlap_ratio_multi_det(walker, delta, trial, i):
     """Calculate overlap ratio for single site update with multi-det trial.
 
@@ -446,11 +712,8 @@ def calculate_overlap_ratio_multi_det(walker, delta, trial, i):
     i : int
         Basis index.
     """
-    for (idx, G) in enumerate(walker.Gi):
-        walker.R[idx,0,0] = (1+delta[0][0]*G[0][i,i])
-        walker.R[idx,0,1] = (1+delta[0][1]*G[1][i,i])
-        walker.R[idx,1,0] = (1+delta[1][0]*G[0][i,i])
-        walker.R[idx,1,1] = (1+delta[1][1]*G[1][i,i])
+    # R[idet,xi,spin] = 1 + delta[xi,spin]*G[idet,spin,i,i]
+    walker.R[:] = 1 + delta[None,:,:]*walker.Gi[:,None,:,i,i]
     spin_prod = numpy.einsum('ikj,ji->ikj',walker.R,walker.ots)
     R = numpy.einsum('i,ij->j',trial.coeffs,spin_prod[:,:,0]*spin_prod[:,:,1])/walker.ot
     return 0.5 * numpy.array([R[0],R[1]])
@@ -482,8 +745,9 @@ def construct_propagator_matrix(system, BT2, config, conjt=False):
     ----------
     system : class
         System class.
-    BT2 : :class:`numpy.ndarray`
-        One body propagator.
+    BT2 : :class:`numpy.ndarray` or list
+        One body propagator for each spin sector, either dense or
+        :class:`pauxy.propagation.operations.Checkerboard` objects.
     config : numpy array
         Auxiliary field configuration.
     conjt : bool
@@ -496,8 +760,10 @@ def construct_propagator_matrix(system, BT2, config, conjt=False):
     """
     bv_up = numpy.diag(numpy.array([system.auxf[xi, 0] for xi in config]))
     bv_down = numpy.diag(numpy.array([system.auxf[xi, 1] for xi in config]))
-    Bup = BT2[0].dot(bv_up).dot(BT2[0])
-    Bdown = BT2[1].dot(bv_down).dot(BT2[1])
+    # B = BT2 bv BT2. BT2 is Hermitian so only left multiplication by BT2 is
+    # required, which means BT2 can also be a Checkerboard object.
+    Bup = BT2[0].dot(BT2[0].dot(bv_up).conj().T).conj().T
+    Bdown = BT2[1].dot(BT2[1].dot(bv_down).conj().T).conj().T
 
     if conjt:
         return numpy.array([Bup.conj().T, Bdown.conj().T])
@@ -560,7 +826,9 @@ def back_propagate(system, psi, trial, nstblz, BT2, dt):
         Back propagated list of walkers.
     """
 
-    psi_bp = [SingleDetWalker(1, system, trial, w) for w in range(len(psi))]
+    # All back propagated walkers start from the trial wavefunction.
+    wbp = SingleDetWalker(1, system, trial, history=False)
+    psi_bp = [copy.deepcopy(wbp) for w in range(len(psi))]
     nup = system.nup
     for (iw, w) in enumerate(psi):
         # propagators should be applied in reverse order
@@ -596,8 +864,10 @@ def back_propagate_ghf(system, psi, trial, nstblz, BT2, dt):
     psi_bp : list of :class:`pauxy.walker.Walker` objects
         Back propagated list of walkers.
     """
-    psi_bp = [MultiGHFWalker(1, system, trial, w, weights='ones', wfn0='GHF')
-              for w in range(len(psi))]
+    # All back propagated walkers start from the trial wavefunction.
+    wbp = MultiGHFWalker(1, system, trial, weights='ones', wfn0='GHF',
+                         history=False)
+    psi_bp = [copy.deepcopy(wbp) for w in range(len(psi))]
     for (iw, w) in enumerate(psi):
         # propagators should be applied in reverse order
         for (i, c) in enumerate(w.field_configs.get_block()[0][::-1]):
@@ -706,30 +976,44 @@ def kinetic_kspace(phi, system, btk):
 
     Parameters
     ---------
-    phi : :class:`pauxy.walkers.MultiGHFWalker` object
-        Walker.
+    phi : :class:`numpy.ndarray`
+        Walker's Slater determinant. Updated inplace.
     system : system object in general.
         Container for model input options.
-    B : :class:`numpy.ndarray`
-        One body propagator.
+    btk : :class:`numpy.ndarray`
+        Diagonal of one body propagator in momentum space.
+    """
+    kinetic_kspace_batch(phi[None,:,:], system, btk)
+
+
+def kinetic_kspace_batch(phi, system, btk):
+    """Apply the kinetic energy projector in kspace to a block of walkers.
+
+    Every walker and both spin sectors are transformed using a single FFT
+    over the lattice axes of a (nwalkers, nx, ny, ne) view of phi. Real
+    walkers use real-to-complex transforms as the kinetic energy is
+    symmetric under k -> -k so that the propagated walkers remain real.
+
+    Parameters
+    ---------
+    phi : :class:`numpy.ndarray`
+        Walkers' Slater determinants of shape (nwalkers, nbasis, ne). Updated
+        inplace.
+    system : system object in general.
+        Container for model input options.
+    btk : :class:`numpy.ndarray`
+        Diagonal of one body propagator in momentum space.
     """
-    s = system
-    # Transform psi to kspace by fft-ing its columns.
-    tup = fft_wavefunction(phi[:,:s.nup], s.nx, s.ny,
-                           s.nup, phi[:,:s.nup].shape)
-    tdown = fft_wavefunction(phi[:,s.nup:], s.nx, s.ny,
-                             s.ndown, phi[:,s.nup:].shape)
-    # Kinetic enery operator is diagonal in momentum space.
-    # Note that multiplying by diagonal btk in this way is faster than using
-    # einsum and way faster than using dot using an actual diagonal matrix.
-    tup = (btk*tup.T).T
-    tdown = (btk*tdown.T).T
-    # Transform phi to kspace by fft-ing its columns.
-    tup = ifft_wavefunction(tup, s.nx, s.ny, s.nup, tup.shape)
-    tdown = ifft_wavefunction(tdown, s.nx, s.ny, s.ndown, tdown.shape)
-    if phi.dtype == float:
-        phi[:,:s.nup] = tup.astype(float)
-        phi[:,s.nup:] = tdown.astype(float)
+    (nx, ny) = (system.nx, system.ny)
+    psi = phi.reshape(phi.shape[0], nx, ny, phi.shape[-1])
+    # Kinetic energy operator is diagonal in momentum space.
+    btk = btk.reshape(1, nx, ny, 1)
+    if numpy.iscomplexobj(phi):
+        psik = numpy.fft.fft2(psi, axes=(1,2))
+        psik *= btk
+        phi[...] = numpy.fft.ifft2(psik, axes=(1,2)).reshape(phi.shape)
     else:
-        phi[:,:s.nup] = tup
-        phi[:,s.nup:] = tdown
+        psik = numpy.fft.rfft2(psi, axes=(1,2))
+        psik *= btk[:,:,:ny//2+1]
+        psi = numpy.fft.irfft2(psik, s=(nx, ny), axes=(1,2))
+        phi[...] = psi.reshape(phi.shape)
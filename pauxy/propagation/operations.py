@@ -42,11 +42,179 @@ def kinetic_real(phi, system, bt2):
         Simulation state.
     """
     nup = system.nup
-    # Assuming that our walker is in UHF form.
+    # Assuming that our walker is in UHF form. Spin restricted walkers only
+    # store the spin up sector so the second update is empty.
     phi[:,:nup] = bt2[0].dot(phi[:,:nup])
     phi[:,nup:] = bt2[1].dot(phi[:,nup:])
 
 
+def kinetic_real_batch(phi, system, bt2):
+    r"""Propagate a block of walkers by the kinetic term.
+
+    The walkers are stacked so that each spin sector is updated by a single
+    matrix-matrix multiplication, :math:`B_{T/2}\cdot[\phi_1,\ldots,\phi_n]`.
+
+    Parameters
+    ----------
+    phi : :class:`numpy.ndarray`
+        Walkers' Slater determinants of shape (nwalkers, nbasis, ne). Updated
+        inplace.
+    system : system object
+        System object.
+    bt2 : :class:`numpy.ndarray`
+        One body propagator for each spin sector.
+    """
+    nup = system.nup
+    phi[:,:,:nup] = numpy.tensordot(bt2[0], phi[:,:,:nup],
+                                    axes=(1,1)).transpose(1,0,2)
+    phi[:,:,nup:] = numpy.tensordot(bt2[1], phi[:,:,nup:],
+                                    axes=(1,1)).transpose(1,0,2)
+
+
+class Checkerboard(object):
+    r"""Checkerboard decomposition of a one-body propagator.
+
+    The bonds of a sparse (e.g. nearest neighbour) one-body matrix :math:`T`
+    are split into families of bonds which share no sites, :math:`T = D +
+    \sum_f T_f`, with :math:`D` diagonal. The bonds within a family commute
+    so :math:`e^{-\tau T_f}` is a product of independent 2x2 rotations, which
+    can be applied in O(N) operations per orbital. The families are applied
+    using a symmetric splitting,
+
+    .. math::
+        e^{-\tau T} \approx e^{-\tau T_1/2}\cdots e^{-\tau T_n}\cdots
+                              e^{-\tau T_1/2},
+
+    whose error is the same order in the timestep as the Trotter
+    decomposition of the full propagator. The resulting propagator is
+    Hermitian.
+
+    Parameters
+    ----------
+    T : :class:`numpy.ndarray`
+        Hermitian one-body matrix.
+    tau : float
+        Imaginary time step.
+
+    Attributes
+    ----------
+    factors : list
+        Factors in the order they are applied. Either a
+        :class:`numpy.ndarray` containing a diagonal, or a tuple (i, j, c,
+        sij, sji) of bond sites and matrix elements of the 2x2 rotations.
+    """
+
+    def __init__(self, T, tau):
+        (rows, cols) = numpy.nonzero(numpy.triu(T, 1))
+        # Greedily assign bonds to families of bonds which share no sites.
+        sites = []
+        families = []
+        for (i, j) in zip(rows, cols):
+            for (used, bonds) in zip(sites, families):
+                if i not in used and j not in used:
+                    break
+            else:
+                used = set()
+                bonds = []
+                sites.append(used)
+                families.append(bonds)
+            used.update((i, j))
+            bonds.append((i, j))
+        diag = numpy.diag(T)
+        if numpy.any(diag != 0):
+            centre = [numpy.exp(-tau*diag)]
+        elif len(families) > 0:
+            centre = [self.bond_factor(T, families.pop(), tau)]
+        else:
+            centre = []
+        half = [self.bond_factor(T, bonds, 0.5*tau) for bonds in families]
+        self.factors = half + centre + half[::-1]
+        self.dtype = T.dtype
+
+    def bond_factor(self, T, bonds, tau):
+        r"""Exponential of a family of bonds.
+
+        For a single bond :math:`e^{-\tau h\sigma} = \cosh(\tau|h|) -
+        \sinh(\tau|h|)h\sigma/|h|`.
+
+        Parameters
+        ----------
+        T : :class:`numpy.ndarray`
+            One-body matrix.
+        bonds : list of tuples
+            Sites (i, j) connected by each bond.
+        tau : float
+            Imaginary time step.
+
+        Returns
+        -------
+        factor : tuple
+            Bond sites and matrix elements of 2x2 rotations (i, j, c, sij,
+            sji).
+        """
+        (i, j) = (numpy.array(b) for b in zip(*bonds))
+        h = T[i,j]
+        mod = numpy.abs(h)
+        c = numpy.cosh(tau*mod)
+        s = -numpy.sinh(tau*mod) / mod
+        return (i, j, c, s*h, s*h.conj())
+
+    def apply(self, phi):
+        """Apply propagator to (a stack of) Slater determinants in place.
+
+        Parameters
+        ----------
+        phi : :class:`numpy.ndarray`
+            Orbitals of shape (..., nbasis, norb). Updated inplace.
+        """
+        for factor in self.factors:
+            if isinstance(factor, numpy.ndarray):
+                phi *= factor[:,None]
+            else:
+                (i, j, c, sij, sji) = factor
+                pi = phi[...,i,:]
+                pj = phi[...,j,:]
+                phi[...,i,:] = c[:,None]*pi + sij[:,None]*pj
+                phi[...,j,:] = c[:,None]*pj + sji[:,None]*pi
+
+    def dot(self, phi):
+        """Matrix product with propagator.
+
+        Mirrors :meth:`numpy.ndarray.dot` so that a Checkerboard can be used
+        in place of a dense propagator.
+
+        Parameters
+        ----------
+        phi : :class:`numpy.ndarray`
+            Matrix of shape (nbasis, norb).
+
+        Returns
+        -------
+        B_phi : :class:`numpy.ndarray`
+            Product of propagator and phi.
+        """
+        B_phi = numpy.array(phi, dtype=numpy.result_type(phi, self.dtype))
+        self.apply(B_phi)
+        return B_phi
+
+
+def kinetic_checkerboard(phi, system, bcb):
+    r"""Propagate by the kinetic term using a checkerboard decomposition.
+
+    Parameters
+    ----------
+    phi : :class:`numpy.ndarray`
+        Walker's Slater determinant of shape (nbasis, ne) or a block of
+        walkers of shape (nwalkers, nbasis, ne). Updated inplace.
+    system : system object
+        System object.
+    bcb : list of :class:`Checkerboard`
+        One body propagator for each spin sector.
+    """
+    nup = system.nup
+    bcb[0].apply(phi[...,:nup])
+    bcb[1].apply(phi[...,nup:])
+
 
 def local_energy_bound(local_energy, mean, threshold):
     """Try to suppress rare population events by imposing local energy bound.
@@ -16,7 +16,7 @@ from pauxy.qmc.options import QMCOpts
 from pauxy.systems.utils import get_system
 from pauxy.trial_wavefunction.utils import get_trial_wavefunction
 from pauxy.utils.misc import get_git_revision_hash, serialise
-from pauxy.walkers.handler import Walkers
+from pauxy.walkers.utils import get_walkers
 
 
 class AFQMC(object):
@@ -74,7 +74,7 @@ class AFQMC(object):
         Container for system specific propagation routines.
     estimators : :class:`pauxy.estimators.Estimators` object
         Estimator handler.
-    psi : :class:`pauxy.walkers.Walkers` object
+    psi : :class:`pauxy.walkers.Walkers` or :class:`pauxy.walkers.WalkerBatch`
         Walker handler. Stores the AFQMC wavefunction.
     """
 
@@ -96,6 +96,7 @@ class AFQMC(object):
         self.system = get_system(model, qmc_opts['dt'], verbose)
         self.qmc = QMCOpts(qmc_opts, self.system, verbose)
         self.cplx = self.determine_dtype(propagator, self.system)
+        self.qmc.cplx = self.cplx
         self.trial = (
             get_trial_wavefunction(trial, self.system, self.cplx,
                                    parallel, verbose)
@@ -107,9 +108,10 @@ class AFQMC(object):
                 Estimators(estimates, self.root, self.qmc, self.system,
                            self.trial, self.propagators.BT_BP, verbose)
             )
-            self.psi = Walkers(self.system, self.trial, self.qmc.nwalkers,
-                               self.estimators.nprop_tot,
-                               self.estimators.nbp, verbose)
+            self.psi = get_walkers(self.system, self.trial, self.qmc,
+                                   self.estimators.nprop_tot,
+                                   self.estimators.nbp, verbose,
+                                   self.estimators.store_history)
             json.encoder.FLOAT_REPR = lambda o: format(o, '.6f')
             json_string = json.dumps(serialise(self, verbose=1),
                                      sort_keys=False, indent=4)
@@ -142,16 +144,38 @@ class AFQMC(object):
         if verbose and self.root:
             self.estimators.estimators['mixed'].print_step(comm, self.nprocs, 0, 1)
 
+        batched = (self.qmc.batched and
+                   hasattr(self.propagators, 'propagate_walker_batch'))
+        # Time spent propagating each walker since the last population
+        # control step, used to balance the cost of walkers moved between
+        # processors. Walkers in a batch are propagated together so can't be
+        # timed individually.
+        if batched:
+            costs = None
+        else:
+            costs = numpy.zeros(len(self.psi.walkers))
         for step in range(1, self.qmc.nsteps + 1):
-            for w in self.psi.walkers:
-                # Want to possibly allow for walkers with negative / complex weights
-                # when not using a constraint. I'm not so sure about the criteria
-                # for complex weighted walkers.
-                if abs(w.weight) > 1e-8 and w.alive:
-                    self.propagators.propagate_walker(
-                        w, self.system, self.trial)
+            if batched:
+                self.psi.wait_comb(self.trial)
+                self.psi.compact()
+                self.propagators.propagate_walker_batch(self.psi, self.system,
+                                                        self.trial)
                 # Constant factors
-                w.weight = w.weight * exp(self.qmc.dt * E_T.real)
+                self.psi.weight *= exp(self.qmc.dt * E_T.real)
+            else:
+                for (i, w) in enumerate(self.psi.walkers):
+                    # Only wait for walkers replaced during population control.
+                    self.psi.wait_walker(i, self.trial)
+                    # Want to possibly allow for walkers with negative /
+                    # complex weights when not using a constraint. I'm not so
+                    # sure about the criteria for complex weighted walkers.
+                    if abs(w.weight) > 1e-8 and w.alive:
+                        start = time.time()
+                        self.propagators.propagate_walker(
+                            w, self.system, self.trial)
+                        costs[i] += time.time() - start
+                    # Constant factors
+                    w.weight = w.weight * exp(self.qmc.dt * E_T.real)
             # calculate estimators
             self.estimators.update(self.system, self.qmc,
                                    self.trial, self.psi, step,
@@ -159,6 +183,10 @@ class AFQMC(object):
             if step % self.qmc.nstblz == 0:
                 self.psi.orthogonalise(self.trial,
                                        self.propagators.free_projection)
+            elif self.qmc.stabilise_threshold is not None:
+                self.psi.orthogonalise(self.trial,
+                                       self.propagators.free_projection,
+                                       self.qmc.stabilise_threshold)
             if step % self.qmc.nupdate_shift == 0:
                 E_T = self.estimators.estimators['mixed'].projected_energy()
             if step % self.qmc.nmeasure == 0:
@@ -166,9 +194,17 @@ class AFQMC(object):
                                            self.qmc.nmeasure)
             if step < self.qmc.nequilibrate:
                 # Update local energy bound.
-                self.propagators.mean_local_energy = E_T
+                self.propagators.mean_local_energy = E_T.real
             if step % self.qmc.npop_control == 0:
-                self.psi.pop_control(comm)
+                self.psi.pop_control(comm, self.trial, costs=costs,
+                                     wait=not self.qmc.async_pop_control)
+                if costs is not None:
+                    costs[:] = 0.0
+            elif self.qmc.nrefill > 0 and step % self.qmc.nrefill == 0:
+                self.psi.refill(comm, self.trial, costs=costs)
+                if costs is not None:
+                    costs[:] = 0.0
+        self.psi.wait_comb(self.trial)
 
     def finalise(self, verbose=False):
         """Tidy up.
@@ -193,12 +229,22 @@ class AFQMC(object):
     def determine_dtype(self, propagator, system):
         """Determine dtype for trial wavefunction and walkers.
 
+        Complex arithmetic is only required for continuous transformations or
+        twisted boundary conditions, otherwise (e.g. the discrete
+        transformation for the Hubbard model) the trial, walkers and
+        estimators are all real.
+
         Parameters
         ----------
         propagator : dict
             Propagator input options.
         system : object
             System object.
+
+        Returns
+        -------
+        cplx : bool
+            True if complex arithmetic is required.
         """
         hs_type = propagator.get('hubbard_stratonovich', 'discrete')
         continuous = 'continuous' in hs_type
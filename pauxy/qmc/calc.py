@@ -14,7 +14,7 @@ except ImportError:
 from pauxy.qmc.afqmc import AFQMC
 from pauxy.estimators.handler import Estimators
 from pauxy.utils.misc import serialise
-from pauxy.walkers.handler import Walkers
+from pauxy.walkers.utils import get_walkers
 
 
 def init_communicator():
@@ -132,11 +132,12 @@ def setup_parallel(options, comm=None, verbose=False):
                    afqmc.trial,
                    afqmc.propagators.BT_BP)
     )
-    afqmc.psi = Walkers(afqmc.system,
-                        afqmc.trial,
-                        afqmc.qmc.nwalkers,
-                        afqmc.estimators.nprop_tot,
-                        afqmc.estimators.nbp)
+    afqmc.psi = get_walkers(afqmc.system,
+                            afqmc.trial,
+                            afqmc.qmc,
+                            afqmc.estimators.nprop_tot,
+                            afqmc.estimators.nbp,
+                            history=afqmc.estimators.store_history)
     if comm.Get_rank() == 0:
         json.encoder.FLOAT_REPR = lambda o: format(o, '.6f')
         json_string = json.dumps(serialise(afqmc, verbose=1),
@@ -171,8 +172,19 @@ class FakeComm:
         return FakeReq()
     def recv(self, sendbuf, root=0):
         pass
+    def Isend(self, sendbuf, dest=None, tag=None):
+        return FakeReq()
+    def Irecv(self, recvbuf, source=None, tag=None):
+        return FakeReq()
     def Reduce(self, sendbuf, recvbuf, op=None):
         recvbuf[:] = sendbuf
+    def Allreduce(self, sendbuf, recvbuf, op=None):
+        recvbuf[:] = sendbuf
+    def Split_type(self, split_type, key=0):
+        return self
+    def Exscan(self, sendbuf, recvbuf, op=None):
+        # Undefined on the root processor.
+        pass
 
 class FakeReq:
 
@@ -180,3 +192,5 @@ class FakeReq:
         pass
     def wait(self):
         pass
+    def Wait(self):
+        pass
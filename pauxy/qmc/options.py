@@ -23,8 +23,45 @@ class QMCOpts(object):
         Frequency of energy measurements.
     nstblz : int
         Frequency of Gram-Schmidt orthogonalisation steps.
+    stabilise_threshold : float
+        If present, in between the orthogonalisation steps every nstblz steps
+        also orthogonalise any walker whose estimated condition number exceeds
+        this threshold. Allows nstblz to be increased. Default None (not
+        used).
     npop_control : int
         Frequency of population control.
+    nrefill : int
+        Frequency of replacing inactive walkers, e.g. those killed by the
+        constraint, by splitting active walkers in between population control
+        steps. Default 0 (not used).
+    pop_control_method : string
+        Population control scheme. Options are:
+
+        - comb : Comb method, walker weights are reset to one (default).
+        - stochastic_reconfiguration : Comb method keeping track of the
+          global weight factor removed from the walkers. This is restored
+          when accumulating mixed estimates and its log is written to
+          mixed_estimates/log_weight_factor.
+        - split_join : Split / join walkers whose weights relative to the
+          mean lie outside split_join_window. No walkers are communicated.
+
+    split_join_window : list
+        Lower and upper relative walker weights used by split_join. Default
+        [0.5, 2.0].
+    async_pop_control : boolean
+        Overlap the communication of walkers during population control with
+        the propagation of walkers which aren't replaced. Default False.
+    hierarchical_pop_control : boolean
+        Perform population control amongst processors on the same node and
+        only occasionally across nodes. Only used with the comb, a warning is
+        issued otherwise. Default False.
+    npop_control_internode : int
+        Number of population control steps between population control across
+        nodes when using hierarchical population control. Default 10.
+    internode_drift : float
+        Also perform population control across nodes if the mean walker weight
+        on a node drifts from the global mean by more than this fraction.
+        Default None (not used).
     temp : float
         Temperature. Currently not used.
     nequilibrate : int
@@ -42,14 +79,33 @@ class QMCOpts(object):
         - generic : Use the generic transformation. To be used with Generic
           system class.
 
+    field_precision : string
+        Precision used to store continuous auxiliary fields for back
+        propagation and ITCFs, 'double' or 'single'. Default 'double'.
+    field_scratch : string
+        Directory in which to store auxiliary fields in a memory mapped file
+        rather than in memory. Useful for long back propagation / ITCF
+        histories. Default None.
     ffts : boolean
         Use FFTS to diagonalise the kinetic energy propagator? Default False.
         This may speed things up for larger lattices.
+    checkerboard : boolean
+        Apply the kinetic energy propagator for the Hubbard model using a
+        checkerboard decomposition, which costs O(N) rather than O(N^2) per
+        orbital. Default False.
+    batched : boolean
+        Store walkers as stacked arrays rather than a list of walker objects.
+        Default False.
+    spin_restricted : boolean
+        Only propagate a single spin sector of the walkers for closed shell
+        generic systems with an RHF trial wavefunction, halving the cost and
+        memory of propagation. Default False.
 
     Attributes
     ----------
     cplx : boolean
-        Do we require complex wavefunctions?
+        Do we require complex wavefunctions? Set by the driver, see
+        :meth:`pauxy.qmc.afqmc.AFQMC.determine_dtype`.
     mf_shift : float
         Mean field shift for continuous Hubbard-Stratonovich transformation.
     iut_fac : complex float
@@ -71,8 +127,22 @@ class QMCOpts(object):
         self.nsteps = inputs.get('nsteps', None)
         self.nmeasure = inputs.get('nmeasure', 10)
         self.nstblz = inputs.get('nstabilise', 10)
+        self.stabilise_threshold = inputs.get('stabilise_threshold', None)
         self.npop_control = inputs.get('npop_control', 10)
+        self.nrefill = inputs.get('nrefill', 0)
+        self.pop_control_method = inputs.get('pop_control_method', 'comb')
+        self.split_join_window = inputs.get('split_join_window', [0.5, 2.0])
+        self.async_pop_control = inputs.get('async_pop_control', False)
+        self.hierarchical_pop_control = inputs.get('hierarchical_pop_control',
+                                                   False)
+        self.npop_control_internode = inputs.get('npop_control_internode', 10)
+        self.internode_drift = inputs.get('internode_drift', None)
         self.nupdate_shift = inputs.get('nupdate_shift', 10)
         self.temp = inputs.get('temperature', None)
         self.nequilibrate = inputs.get('nequilibrate', int(1.0/self.dt))
         self.ffts = inputs.get('kinetic_kspace', False)
+        self.checkerboard = inputs.get('kinetic_checkerboard', False)
+        self.batched = inputs.get('batched', False)
+        self.spin_restricted = inputs.get('spin_restricted', False)
+        self.field_precision = inputs.get('field_precision', 'double')
+        self.field_scratch = inputs.get('field_scratch', None)
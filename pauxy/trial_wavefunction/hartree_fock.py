@@ -12,7 +12,10 @@ class HartreeFock(object):
         self.type = "hartree_fock"
         self.initial_wavefunction = trial.get('initial_wavefunction',
                                               'hartree_fock')
-        self.trial_type = complex
+        if cplx:
+            self.trial_type = complex
+        else:
+            self.trial_type = float
         self.psi = numpy.zeros(shape=(system.nbasis, system.nup+system.ndown),
                                dtype=self.trial_type)
         occup = numpy.identity(system.nup)
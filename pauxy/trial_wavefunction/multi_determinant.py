@@ -1,5 +1,12 @@
+import copy
 import numpy
-from pauxy.estimators.mixed import gab, local_energy, gab_multi_det_full
+import time
+from pauxy.estimators.mixed import (
+    gab,
+    gab_multi_det_full,
+    local_energy,
+    local_energy_ghf_full
+)
 from pauxy.utils.linalg import diagonalise_sorted
 from pauxy.utils.io import read_fortran_complex_numbers
 
@@ -26,10 +33,7 @@ class MultiDeterminant(object):
             nbasis = system.nbasis
         else:
             nbasis = 2 * system.nbasis
-        self.GAB = numpy.zeros(shape=(self.ndets, self.ndets, nbasis, nbasis),
-                               dtype=self.trial_type)
-        self.weights = numpy.zeros(shape=(self.ndets, self.ndets),
-                                   dtype=self.trial_type)
+        self.occupations_file = trial.get('occupations', None)
         # For debugging purposes.
         if self.type == 'free_electron':
             (self.eigs, self.eigv) = diagonalise_sorted(system.T[0])
@@ -40,6 +44,28 @@ class MultiDeterminant(object):
             self.G = numpy.zeros(2, nbasis, nbasis)
             self.emin = sum(self.eigs[:system.nup]) + sum(self.eigs[:system.ndown])
             self.coeffs = numpy.ones(self.ndets)
+        elif self.occupations_file is not None:
+            # Expansion defined as excitations of a reference determinant
+            # built from a single set of orbitals.
+            self.expansion = "excitations"
+            self.orbital_file = trial.get('orbitals')
+            self.coeffs_file = trial.get('coefficients')
+            if verbose:
+                print ("# Reading wavefunction from %s." % self.coeffs_file)
+            coeffs = read_fortran_complex_numbers(self.coeffs_file)
+            orbitals = read_fortran_complex_numbers(self.orbital_file)
+            self.orbs = orbitals.reshape((nbasis, -1), order='F')
+            occs = numpy.loadtxt(self.occupations_file, dtype=int)
+            occs = occs.reshape((self.ndets, system.ne))
+            (self.excitations, signs) = excitation_table(occs)
+            self.coeffs = signs * coeffs
+            self.psi = numpy.array([self.orbs[:,occs[0]]])
+            self.G = gab(self.psi[0], self.psi[0]).T
+            if verbose:
+                print ("# Number of orbitals: %d." % self.orbs.shape[1])
+                for (idx, holes, particles) in self.excitations:
+                    print ("# Number of %d-fold excitations: %d."
+                           % (holes.shape[1], len(idx)))
         else:
             self.orbital_file = trial.get('orbitals')
             self.coeffs_file = trial.get('coefficients')
@@ -48,6 +74,10 @@ class MultiDeterminant(object):
             if verbose:
                 print ("# Reading wavefunction from %s." % self.coeffs_file)
             self.coeffs = read_fortran_complex_numbers(self.coeffs_file)
+            self.GAB = numpy.zeros(shape=(self.ndets, self.ndets, nbasis,
+                                          nbasis), dtype=self.trial_type)
+            self.weights = numpy.zeros(shape=(self.ndets, self.ndets),
+                                       dtype=self.trial_type)
             self.psi = numpy.zeros(shape=(self.ndets, nbasis, system.ne),
                                    dtype=self.coeffs.dtype)
             orbitals = read_fortran_complex_numbers(self.orbital_file)
@@ -68,3 +98,74 @@ class MultiDeterminant(object):
         self.initialisation_time = time.time() - init_time
         if verbose:
             print ("# Finished setting up trial wavefunction.")
+
+
+def excitation_table(occs):
+    """Express determinants as excitations of a reference determinant.
+
+    The first determinant is used as the reference. For each determinant we
+    find the columns (holes) of the reference determinant which are replaced
+    by orbitals (particles), where the particles replace the holes in place.
+
+    Parameters
+    ----------
+    occs : :class:`numpy.ndarray`
+        Orbitals occupied in each determinant. Shape (ndets, nelec).
+
+    Returns
+    -------
+    excitations : list of tuples
+        (index, holes, particles) for each excitation level greater than zero.
+        index contains the indices of the determinants at this excitation
+        level, holes (particles) the reference columns (orbitals) which are
+        excited from (to).
+    signs : :class:`numpy.ndarray`
+        Sign of the permutation required to bring the determinant into the
+        order obtained by replacing holes with particles in place.
+    """
+    ref = list(occs[0])
+    levels = {}
+    signs = numpy.ones(len(occs))
+    for (idet, occ) in enumerate(occs):
+        holes = [j for (j, o) in enumerate(ref) if o not in occ]
+        particles = [o for o in occ if o not in ref]
+        excited = copy.copy(ref)
+        for (j, a) in zip(holes, particles):
+            excited[j] = a
+        signs[idet] = permutation_parity([excited.index(o) for o in occ])
+        if len(holes) > 0:
+            levels.setdefault(len(holes), []).append((idet, holes, particles))
+    excitations = []
+    for nex in sorted(levels.keys()):
+        (idx, holes, particles) = zip(*levels[nex])
+        excitations.append((numpy.array(idx), numpy.array(holes),
+                            numpy.array(particles)))
+    return (excitations, signs)
+
+
+def permutation_parity(perm):
+    """Parity of a permutation.
+
+    Parameters
+    ----------
+    perm : list
+        Permutation of 0,...,n-1.
+
+    Returns
+    -------
+    parity : int
+        +1 for even permutations, -1 for odd.
+    """
+    parity = 1
+    visited = [False] * len(perm)
+    for i in range(len(perm)):
+        if not visited[i]:
+            j = i
+            length = 0
+            while not visited[j]:
+                visited[j] = True
+                j = perm[j]
+                length += 1
+            if length % 2 == 0:
+                parity = -parity
+    return parity
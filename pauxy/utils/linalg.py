@@ -1,6 +1,9 @@
 import numpy
 import scipy.linalg
 
+# numpy.linalg.qr only supports stacks of matrices from numpy 1.22.
+STACKED_QR = numpy.lib.NumpyVersion(numpy.__version__) >= '1.22.0'
+
 def sherman_morrison(Ainv, u, vt):
     r"""Sherman-Morrison update of a matrix inverse:
 
@@ -8,10 +11,13 @@ def sherman_morrison(Ainv, u, vt):
         (A + u \otimes v)^{-1} = A^{-1} - \frac{A^{-1}u v^{T} A^{-1}}
                                                {1+v^{T}A^{-1} u}
 
+    The update is applied in place and only requires :math:`O(N^2)`
+    operations.
+
     Parameters
     ----------
     Ainv : numpy.ndarray
-        Matrix inverse of A to be updated.
+        Matrix inverse of A to be updated. Overwritten on output.
     u : numpy.array
         column vector
     vt : numpy.array
@@ -22,10 +28,125 @@ def sherman_morrison(Ainv, u, vt):
     Ainv : numpy.ndarray
         Updated matrix inverse.
     """
+    Ainv_u = Ainv.dot(u)
+    vt_Ainv = vt.dot(Ainv)
+    denom = 1.0 + vt.dot(Ainv_u)
+    Ainv -= numpy.outer(Ainv_u/denom, vt_Ainv)
+    return Ainv
+
+
+def sherman_morrison_batch(Ainv, u, vt):
+    r"""Sherman-Morrison update of a block of matrix inverses.
+
+    Batched equivalent of :func:`sherman_morrison`.
+
+    Parameters
+    ----------
+    Ainv : numpy.ndarray
+        Stack of matrix inverses of shape (nmat, N, N). Overwritten on output.
+    u : numpy.array
+        Column vectors of shape (nmat, N) or a single vector of shape (N,)
+        common to all matrices.
+    vt : numpy.array
+        Transposed row vectors of shape (nmat, N) or a single vector of shape
+        (N,) common to all matrices.
+
+    Returns
+    -------
+    Ainv : numpy.ndarray
+        Updated matrix inverses.
+    """
+    if u.ndim == 1:
+        Ainv_u = Ainv.dot(u)
+    else:
+        Ainv_u = numpy.einsum('wij,wj->wi', Ainv, u)
+    if vt.ndim == 1:
+        vt_Ainv = vt.dot(Ainv)
+        denom = 1.0 + Ainv_u.dot(vt)
+    else:
+        vt_Ainv = numpy.einsum('wi,wij->wj', vt, Ainv)
+        denom = 1.0 + numpy.einsum('wi,wi->w', vt, Ainv_u)
+    Ainv -= (Ainv_u/denom[:,None])[:,:,None] * vt_Ainv[:,None,:]
+    return Ainv
+
+
+def inverse_log_det(A):
+    """Inverse and log determinant of a square matrix.
+
+    Both are obtained from a single LU factorisation of A. The log of the
+    determinant is complex, with the imaginary part storing its phase, so
+    that ratios of determinants can be computed as exponentials of
+    differences without overflow.
+
+    Parameters
+    ----------
+    A : :class:`numpy.ndarray`
+        Square matrix.
+
+    Returns
+    -------
+    Ainv : :class:`numpy.ndarray`
+        Inverse of A.
+    log_det : complex
+        Log of the determinant of A.
+    """
+    (lu, piv) = scipy.linalg.lu_factor(A, check_finite=False)
+    identity = numpy.identity(A.shape[0], dtype=lu.dtype)
+    Ainv = scipy.linalg.lu_solve((lu, piv), identity, check_finite=False)
+    # Each row interchange flips the sign of the determinant.
+    nswap = numpy.count_nonzero(piv != numpy.arange(len(piv)))
+    log_det = numpy.sum(numpy.log(numpy.diag(lu).astype(numpy.complex128)))
+    if nswap % 2 == 1:
+        log_det += 1j*numpy.pi
+    return (Ainv, log_det)
 
-    return (
-        Ainv - (Ainv.dot(numpy.outer(u,vt)).dot(Ainv))/(1.0+vt.dot(Ainv).dot(u))
-    )
+
+def log_det(A):
+    """Log determinant of a (stack of) square matrices.
+
+    Parameters
+    ----------
+    A : :class:`numpy.ndarray`
+        Square matrix or stack of square matrices.
+
+    Returns
+    -------
+    log_det : complex or :class:`numpy.ndarray`
+        Log of the determinant(s) of A. The imaginary part stores the phase.
+    """
+    (sign, log_abs_det) = numpy.linalg.slogdet(A)
+    return log_abs_det + numpy.log(numpy.asarray(sign, dtype=numpy.complex128))
+
+
+def adjugate(A):
+    r"""Adjugate of a (stack of) square matrices.
+
+    The adjugate satisfies :math:`\mathrm{adj}(A) = \det(A)A^{-1}` but remains
+    well defined when A is singular. Computed from cofactors so only suitable
+    for small matrices.
+
+    Parameters
+    ----------
+    A : :class:`numpy.ndarray`
+        Square matrix or stack of square matrices.
+
+    Returns
+    -------
+    adj : :class:`numpy.ndarray`
+        Adjugate of A.
+    """
+    n = A.shape[-1]
+    adj = numpy.ones_like(A)
+    if n == 1:
+        return adj
+    idx = numpy.arange(n)
+    for i in range(n):
+        rows = idx[idx!=i]
+        for j in range(n):
+            cols = idx[idx!=j]
+            minor = A[...,rows[:,None],cols[None,:]]
+            adj[...,j,i] = (-1)**(i+j) * numpy.linalg.det(minor)
+    return adj
 
 
 def diagonalise_sorted(H):
@@ -112,6 +233,79 @@ def reortho(A):
     return (Q, detR)
 
 
+def reortho_batch(A):
+    """Reorthogonalise a stack of MxN matrices.
+
+    Batched version of :func:`reortho`. All matrices are QR decomposed with a
+    single call and the phases of the diagonal of R are factored into Q by
+    broadcasting so that the diagonal of R is real and positive. As R is
+    upper triangular the log of its determinant is then simply the sum of the
+    log of its diagonal, which is returned in place of the determinant to
+    avoid overflow. With numpy < 1.22 the matrices are decomposed in turn.
+
+    Parameters
+    ----------
+    A : :class:`numpy.ndarray`
+        Stack of MxN matrices. Shape (nmat, M, N).
+
+    Returns
+    -------
+    Q : :class:`numpy.ndarray`
+        Orthogonal matrices. A = QR.
+    log_detR : :class:`numpy.ndarray`
+        Log of the determinant of R for each matrix.
+    """
+    if STACKED_QR:
+        (Q, R) = numpy.linalg.qr(A)
+    else:
+        # Older versions of numpy can only decompose a single matrix.
+        nmat, M, N = A.shape
+        K = min(M, N)
+        Q = numpy.zeros((nmat, M, K), dtype=numpy.result_type(A, 1.0))
+        R = numpy.zeros((nmat, K, N), dtype=Q.dtype)
+        for i in range(nmat):
+            (Q[i], R[i]) = scipy.linalg.qr(A[i], mode='economic')
+    diag = numpy.diagonal(R, axis1=-2, axis2=-1)
+    mod = numpy.abs(diag)
+    Q = Q * (diag/mod)[...,None,:]
+    return (Q, numpy.sum(numpy.log(mod), axis=-1))
+
+
+def condition_estimate(A):
+    """Estimate the condition number of a (stack of) matrices.
+
+    Computed from the eigenvalues of the NxN Gram matrix :math:`A^{\\dagger}A`,
+    i.e., :math:`\\kappa(A) = (\\lambda_{max}/\\lambda_{min})^{1/2}`, which
+    costs O(MN^2) operations. This detects both columns whose norms differ
+    and columns which become (nearly) linearly dependent, which happens to
+    the columns of a Slater determinant during imaginary time propagation.
+    The Gram matrix squares the condition number so the estimate is only
+    accurate up to the inverse square root of machine precision, beyond which
+    it remains large. Matrices with a numerically singular Gram matrix are
+    assigned an infinite condition number.
+
+    Should be applied to each spin sector of a walker separately.
+
+    Parameters
+    ----------
+    A : :class:`numpy.ndarray`
+        MxN matrix or stack of MxN matrices.
+
+    Returns
+    -------
+    cond : float or :class:`numpy.ndarray`
+        Estimated condition number of each matrix.
+    """
+    if A.shape[-1] == 0:
+        return numpy.ones(A.shape[:-2])[()]
+    S = numpy.matmul(numpy.swapaxes(A.conj(), -1, -2), A)
+    eigs = numpy.linalg.eigvalsh(S)
+    (emin, emax) = (eigs[...,0], eigs[...,-1])
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        cond = numpy.where(emin > 0, numpy.sqrt(emax/emin), numpy.inf)
+    return cond[()]
+
+
 def modified_cholesky(M, kappa, verbose=False):
     """Modified cholesky decomposition of matrix.
 
@@ -156,11 +350,119 @@ def modified_cholesky(M, kappa, verbose=False):
 
     return numpy.array(chol_vecs)
 
-def exponentiate_matrix(M, order=6):
-    """Taylor series approximation for matrix exponential"""
-    T = numpy.copy(M)
-    EXPM = numpy.identity(M.shape[0], dtype=M.dtype)
+def one_norm(M):
+    """Matrix one norm (maximum absolute column sum).
+
+    Parameters
+    ----------
+    M : :class:`numpy.ndarray`
+        Matrix or stack of matrices of shape (..., N, N).
+
+    Returns
+    -------
+    norm : float or :class:`numpy.ndarray`
+        One norm of each matrix in the stack.
+    """
+    return numpy.abs(M).sum(axis=-2).max(axis=-1)
+
+def taylor_order(norm, tol, nmax):
+    """Truncation order for the Taylor series of exp(M).
+
+    The n-th term of the series acting on a vector x is bounded by
+    ||M||^n/n! ||x||, so we keep terms until the first omitted term's bound
+    falls below tol.
+
+    Parameters
+    ----------
+    norm : float
+        (Upper bound on) the norm of M.
+    tol : float
+        Tolerance on the relative size of the first omitted term. If None
+        the full nmax terms are retained.
+    nmax : int
+        Maximum expansion order.
+
+    Returns
+    -------
+    order : int
+        Truncation order.
+    """
+    if tol is None:
+        return nmax
+    order = 0
+    bound = 1.0
+    while order < nmax:
+        bound *= norm / (order+1)
+        if bound < tol:
+            break
+        order += 1
+    return order
+
+def apply_exponential(phi, M, nmax=6, tol=None):
+    """Apply matrix exponential to wavefunction(s) using a Taylor series.
+
+    Avoids forming exp(M) which costs O(N^3) per order compared to
+    O(N^2 n_e) when acting on phi directly. Stacks of matrices and
+    wavefunctions are handled in a single call with a common truncation order
+    determined by the largest norm in the stack.
+
+    Parameters
+    ----------
+    phi : :class:`numpy.ndarray`
+        Wavefunction(s) of shape (..., N, n_e). On output phi = exp(M) phi.
+    M : :class:`numpy.ndarray`
+        Matrix or stack of matrices of shape (..., N, N).
+    nmax : int
+        Maximum expansion order.
+    tol : float
+        Tolerance for adaptive truncation. If None nmax terms are used.
+
+    Returns
+    -------
+    order : int
+        Expansion order used.
+    """
+    if tol is None:
+        order = nmax
+    else:
+        order = taylor_order(numpy.max(one_norm(M)), tol, nmax)
+    temp = numpy.copy(phi)
     for n in range(1, order+1):
-        EXPM += T
-        T = M.dot(T) / (n+1)
+        temp = numpy.matmul(M, temp) / n
+        phi += temp
+    return order
+
+def exponentiate_matrix(M, order=6, tol=None):
+    """Taylor series approximation for matrix exponential.
+
+    Uses scaling and squaring so that the series is only ever evaluated for
+    matrices of norm at most one half, i.e., exp(M) = exp(M/2^s)^(2^s).
+    Matrices with small norm are exponentiated directly.
+
+    Parameters
+    ----------
+    M : :class:`numpy.ndarray`
+        Matrix or stack of matrices of shape (..., N, N).
+    order : int
+        Maximum expansion order.
+    tol : float
+        Tolerance for adaptive truncation. If None order terms are used.
+
+    Returns
+    -------
+    EXPM : :class:`numpy.ndarray`
+        Approximation to exp(M).
+    """
+    norm = numpy.max(one_norm(M))
+    nsquare = 0
+    if norm > 0.5:
+        nsquare = int(numpy.ceil(numpy.log2(2*norm)))
+    if tol is not None:
+        # Errors in the scaled exponential are amplified by squaring.
+        tol = tol / 2**nsquare
+    EXPM = numpy.zeros(M.shape, dtype=numpy.result_type(M, 1.0))
+    EXPM[...] = numpy.identity(M.shape[-1])
+    apply_exponential(EXPM, M/2**nsquare, nmax=order, tol=tol)
+    for i in range(nsquare):
+        EXPM = numpy.matmul(EXPM, EXPM)
     return EXPM
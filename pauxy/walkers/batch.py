@@ -0,0 +1,817 @@
+import copy
+import numpy
+from pauxy.estimators.mixed import local_energy_batch
+from pauxy.trial_wavefunction.free_electron import FreeElectron
+from pauxy.utils.linalg import condition_estimate, reortho_batch, log_det
+from pauxy.walkers.buffer import WalkerBuffer
+from pauxy.walkers.handler import (
+    allocate_field_configs,
+    field_config_dtype,
+    FieldConfig,
+    PopulationControl
+)
+from pauxy.walkers.single_det import SingleDetWalker
+
+
+class WalkerBatch(PopulationControl):
+    """Container for a block of UHF style walkers stored as stacked arrays.
+
+    Drop in replacement for :class:`pauxy.walkers.handler.Walkers` when using
+    a single determinant trial wavefunction. All walker data lives in
+    contiguous arrays indexed by walker, so that operations acting on every
+    walker can be performed using a single (batched) call.
+
+    Parameters
+    ----------
+    system : object
+        System object.
+    trial : object
+        Trial wavefunction object.
+    nwalkers : int
+        Number of walkers to initialise.
+    nprop_tot : int
+        Total number of propagators to store for back propagation + itcf.
+    nbp : int
+        Number of back propagation steps.
+    field_precision : string, optional
+        Precision of stored continuous auxiliary fields, 'double' or
+        'single'. Default 'double'.
+    scratch : string, optional
+        If present auxiliary field configurations are stored in a memory
+        mapped file in this directory. Default None.
+    history : bool, optional
+        If True store historic wavefunctions and auxiliary field
+        configurations. Default True.
+
+    Attributes
+    ----------
+    phi : :class:`numpy.ndarray`
+        Walkers' Slater determinants. Shape (nwalkers, nbasis, ne).
+    inv_ovlp : list of :class:`numpy.ndarray`
+        Inverse overlap matrices for each spin sector. Shapes
+        (nwalkers, nup, nup) and (nwalkers, ndown, ndown).
+    G : :class:`numpy.ndarray`
+        Walkers' Green's functions. Shape (nwalkers, 2, nbasis, nbasis).
+    Gmod : :class:`numpy.ndarray`
+        Half rotated Green's functions. Shape (nwalkers, 2, nbasis, nup).
+    weight : :class:`numpy.ndarray`
+        Walkers' weights.
+    log_ot : :class:`numpy.ndarray`
+        Log of walkers' overlaps with the trial wavefunction. The overlaps
+        themselves are available as ot.
+    log_ovlp : :class:`numpy.ndarray`
+        Log of overlaps found when the inverse overlap matrices were last
+        computed, see :meth:`calc_log_otrial`.
+    E_L : :class:`numpy.ndarray`
+        Walkers' local energies.
+    dirty : :class:`numpy.ndarray`
+        Flags walkers whose Green's function is out of date.
+    energy : :class:`numpy.ndarray`
+        Cached local energy components (E, T, V). Shape (nwalkers, 3).
+    energy_valid : :class:`numpy.ndarray`
+        Flags walkers whose cached local energy is up to date.
+    alive : :class:`numpy.ndarray`
+        Flags walkers which are alive.
+    walkers : list of :class:`BatchWalker`
+        Per walker views into the stacked arrays. Used by routines which
+        operate on one walker at a time.
+    """
+
+    def __init__(self, system, trial, nwalkers, nprop_tot, nbp, verbose=False,
+                 field_precision='double', scratch=None, history=True):
+        if verbose:
+            print("# Storing walkers as stacked arrays.")
+        self.nup = system.nup
+        nup = system.nup
+        ndown = system.ndown
+        dtype = trial.psi.dtype
+        self.phi = numpy.zeros(shape=(nwalkers, system.nbasis, system.ne),
+                               dtype=dtype)
+        if trial.initial_wavefunction == 'free_electron':
+            tmp = FreeElectron(system, system.ktwist.all() != None, {})
+            self.phi[:] = tmp.psi
+        else:
+            self.phi[:] = trial.psi
+        self.inv_ovlp = [numpy.zeros(shape=(nwalkers, nup, nup), dtype=dtype),
+                         numpy.zeros(shape=(nwalkers, ndown, ndown),
+                                     dtype=dtype)]
+        self.G = numpy.zeros(shape=(nwalkers, 2, system.nbasis, system.nbasis),
+                             dtype=dtype)
+        self.Gmod = numpy.zeros(shape=(nwalkers, 2, system.nbasis, nup),
+                                dtype=dtype)
+        self.dirty = numpy.ones(nwalkers, dtype=bool)
+        self.energy = numpy.zeros(shape=(nwalkers, 3), dtype=dtype)
+        self.energy_valid = numpy.zeros(nwalkers, dtype=bool)
+        self.log_ovlp = numpy.zeros(nwalkers, dtype=numpy.complex128)
+        # Every walker starts in the same state so only compute the derived
+        # quantities of the first walker and broadcast them to the rest.
+        first = slice(0, 1)
+        self.inverse_overlap(trial, first)
+        self.greens_function(trial, first)
+        self.local_energy(system, first)
+        for a in [self.inv_ovlp[0], self.inv_ovlp[1], self.log_ovlp, self.G,
+                  self.dirty, self.energy, self.energy_valid]:
+            a[1:] = a[0]
+        self.weight = numpy.ones(nwalkers, dtype=dtype)
+        self.log_ot = numpy.zeros(nwalkers, dtype=numpy.complex128)
+        self.E_L = self.local_energy(system)[0].real
+        self.alive = numpy.ones(nwalkers, dtype=int)
+        self.history = history
+        if history:
+            # Historic wavefunction for back propagation.
+            self.phi_old = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_init = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_bp = copy.deepcopy(self.phi)
+        else:
+            self.phi_old = None
+            self.phi_init = None
+            self.phi_bp = None
+        self.walkers = [BatchWalker(self, iw) for iw in range(nwalkers)]
+        dtype = field_config_dtype(system, field_precision)
+        super(WalkerBatch, self).__init__()
+        if history:
+            self.add_field_config(nprop_tot, nbp, system.nfields, dtype,
+                                  scratch)
+        self.calculate_total_weight()
+        self.calculate_nwalkers()
+
+    @property
+    def ot(self):
+        """Walkers' overlaps with the trial wavefunction."""
+        return self.exp_overlap(self.log_ot)
+
+    def exp_overlap(self, log_ovlp):
+        """Convert log overlaps to overlaps of the walkers' type.
+
+        Parameters
+        ----------
+        log_ovlp : :class:`numpy.ndarray`
+            Log of overlaps.
+
+        Returns
+        -------
+        ovlp : :class:`numpy.ndarray`
+            Overlaps. Real if the walkers are real.
+        """
+        ovlp = numpy.exp(log_ovlp)
+        if numpy.iscomplexobj(self.phi):
+            return ovlp
+        else:
+            return ovlp.real
+
+    def calculate_total_weight(self):
+        self.total_weight = sum(self.weight[self.alive == 1])
+
+    def calculate_nwalkers(self):
+        self.nw = sum(self.alive)
+
+    def active_mask(self):
+        """Mask of walkers which should be propagated.
+
+        Returns
+        -------
+        mask : :class:`numpy.ndarray`
+            True for alive walkers with non-negligible weight.
+        """
+        return (numpy.abs(self.weight) > 1e-8) & (self.alive == 1)
+
+    def active_walkers(self):
+        """Indices of walkers which should be propagated.
+
+        Returns
+        -------
+        index : slice or :class:`numpy.ndarray`
+            Indices of alive walkers with non-negligible weight. A slice if
+            these are stored contiguously from the start, see :meth:`compact`.
+        """
+        active = self.active_mask()
+        nactive = numpy.sum(active)
+        if active[:nactive].all():
+            return slice(0, nactive)
+        else:
+            return numpy.where(active)[0]
+
+    def inverse_overlap(self, trial, index=slice(None)):
+        """Compute inverse overlap matrices of walkers from scratch.
+
+        The log of the overlaps with the trial wavefunction are computed
+        alongside, see :meth:`calc_log_otrial`.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to update. Default all.
+        """
+        nup = self.nup
+        t = trial.psi
+        phi = self.phi[index]
+        ovlp_up = numpy.matmul(t[:,:nup].conj().T, phi[:,:,:nup])
+        ovlp_down = numpy.matmul(t[:,nup:].conj().T, phi[:,:,nup:])
+        self.inv_ovlp[0][index] = numpy.linalg.inv(ovlp_up)
+        self.inv_ovlp[1][index] = numpy.linalg.inv(ovlp_down)
+        self.log_ovlp[index] = log_det(ovlp_up) + log_det(ovlp_down)
+
+    def calc_otrial(self, trial, index=slice(None)):
+        """Caculate overlaps of walkers with trial wavefunction.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to consider. Default all.
+
+        Returns
+        -------
+        ot : :class:`numpy.ndarray`
+            Overlaps.
+        """
+        return self.exp_overlap(self.calc_log_otrial(trial, index))
+
+    def calc_log_otrial(self, trial, index=slice(None)):
+        """Caculate log of overlaps of walkers with trial wavefunction.
+
+        Available after :meth:`inverse_overlap` without further work.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to consider. Default all.
+
+        Returns
+        -------
+        log_ot : :class:`numpy.ndarray`
+            Log of overlaps.
+        """
+        return self.log_ovlp[index]
+
+    def greens_function(self, trial, index=slice(None)):
+        """Compute walkers' green's functions.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to update. Default all.
+        """
+        nup = self.nup
+        t = trial.psi
+        phi = self.phi[index]
+        Gup = numpy.matmul(numpy.matmul(phi[:,:,:nup], self.inv_ovlp[0][index]),
+                           t[:,:nup].conj().T)
+        Gdown = numpy.matmul(numpy.matmul(phi[:,:,nup:], self.inv_ovlp[1][index]),
+                             t[:,nup:].conj().T)
+        self.G[index,0] = Gup.transpose(0,2,1)
+        self.G[index,1] = Gdown.transpose(0,2,1)
+        self.dirty[index] = False
+        self.energy_valid[index] = False
+
+    def update_greens_function(self, trial, index=slice(None)):
+        """Recompute green's functions of dirty walkers only.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to consider. Default all.
+        """
+        walkers = numpy.arange(len(self.phi))[index]
+        stale = walkers[self.dirty[walkers]]
+        if len(stale) > 0:
+            self.greens_function(trial, stale)
+
+    def invalidate(self, index=slice(None)):
+        """Flag cached green's functions and local energies as out of date.
+
+        Should be called whenever phi is modified.
+
+        Parameters
+        ----------
+        index : slice or :class:`numpy.ndarray`
+            Walkers to invalidate. Default all.
+        """
+        self.dirty[index] = True
+        self.energy_valid[index] = False
+
+    def rotated_greens_function(self, index=slice(None)):
+        """Compute walkers' "rotated" green's functions.
+
+        Green's function without trial wavefunction multiplication.
+
+        Parameters
+        ----------
+        index : slice or :class:`numpy.ndarray`
+            Walkers to update. Default all.
+        """
+        nup = self.nup
+        phi = self.phi[index]
+        self.Gmod[index,0] = numpy.matmul(phi[:,:,:nup], self.inv_ovlp[0][index])
+        self.Gmod[index,1] = numpy.matmul(phi[:,:,nup:], self.inv_ovlp[1][index])
+
+    def local_energy(self, system, index=slice(None)):
+        """Compute walkers' local energies.
+
+        Only walkers whose cached energy is out of date are recomputed.
+
+        Parameters
+        ----------
+        system : object
+            System object.
+        index : slice or :class:`numpy.ndarray`
+            Walkers to consider. Default all.
+
+        Returns
+        -------
+        (E, T, V) : tuple
+            Arrays containing mixed estimates for walkers' energy components.
+        """
+        walkers = numpy.arange(len(self.phi))[index]
+        stale = walkers[~self.energy_valid[walkers]]
+        if len(stale) > 0:
+            (E, T, V) = local_energy_batch(system, self.G[stale])
+            self.energy[stale,0] = E
+            self.energy[stale,1] = T
+            self.energy[stale,2] = V
+            self.energy_valid[stale] = True
+        energy = self.energy[walkers]
+        return (energy[:,0], energy[:,1], energy[:,2])
+
+    def orthogonalise(self, trial, free_projection, threshold=None):
+        """Orthogonalise walkers.
+
+        All walkers are QR decomposed at once, see
+        :func:`pauxy.utils.linalg.reortho_batch`. The overlaps are recomputed
+        from the orthogonalised walkers rather than by dividing through by
+        det(R), which can overflow.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        free_projection : bool
+            True if doing free projection.
+        threshold : float, optional
+            If present only orthogonalise walkers for which the estimated
+            condition number of either spin sector exceeds threshold, see
+            :func:`pauxy.utils.linalg.condition_estimate`. Default None
+            (orthogonalise all walkers).
+        """
+        nup = self.nup
+        index = numpy.arange(len(self.phi))
+        if threshold is not None:
+            cond = numpy.maximum(condition_estimate(self.phi[:,:,:nup]),
+                                 condition_estimate(self.phi[:,:,nup:]))
+            index = index[cond > threshold]
+            if len(index) == 0:
+                return
+        (Qup, log_dup) = reortho_batch(self.phi[index,:,:nup])
+        (Qdown, log_ddown) = reortho_batch(self.phi[index,:,nup:])
+        self.phi[index,:,:nup] = Qup
+        self.phi[index,:,nup:] = Qdown
+        self.inverse_overlap(trial, index)
+        self.log_ot[index] = self.calc_log_otrial(trial, index)
+        if free_projection:
+            self.weight[index] *= numpy.exp(log_dup+log_ddown)
+
+    def add_field_config(self, nprop_tot, nbp, nfields, dtype, scratch=None):
+        """Add FieldConfig object to walker object.
+
+        Parameters
+        ----------
+        nprop_tot : int
+            Total number of propagators to store for back propagation + itcf.
+        nbp : int
+            Number of back propagation steps.
+        nfields : int
+            Number of fields to store for each back propagation step.
+        dtype : type
+            Field configuration type.
+        scratch : string, optional
+            Directory for memory mapped field configurations, see
+            :func:`pauxy.walkers.handler.allocate_field_configs`.
+        """
+        configs = allocate_field_configs(len(self.walkers), nprop_tot,
+                                         nfields, dtype, scratch)
+        for (iw, w) in enumerate(self.walkers):
+            w.field_configs = FieldConfig(nfields, nprop_tot, nbp, dtype,
+                                          configs=configs[iw])
+
+    def copy_historic_wfn(self):
+        """Copy current wavefunction to psi_n for next back propagation step."""
+        numpy.copyto(self.phi_old, self.phi)
+
+    def copy_bp_wfn(self, phi_bp):
+        """Copy back propagated wavefunction.
+
+        Parameters
+        ----------
+        phi_bp : object
+            list of walker objects containing back propagated walkers.
+        """
+        for (i, wbp) in enumerate(phi_bp):
+            numpy.copyto(self.phi_bp[i], wbp.phi)
+
+    def copy_init_wfn(self):
+        """Copy current wavefunction to initial wavefunction.
+
+        The definition of the initial wavefunction depends on whether we are
+        calculating an ITCF or not.
+        """
+        numpy.copyto(self.phi_init, self.phi)
+
+    def copy_walker(self, i, j):
+        """Overwrite walker j with a copy of walker i.
+
+        Parameters
+        ----------
+        i : int
+            Index of walker to copy.
+        j : int
+            Index of walker to overwrite.
+        """
+        for a in [self.phi, self.G, self.inv_ovlp[0], self.inv_ovlp[1],
+                  self.weight, self.log_ot, self.log_ovlp, self.E_L,
+                  self.dirty, self.energy, self.energy_valid]:
+            a[j] = a[i]
+        for (ai, aj) in zip(self.history_arrays(i), self.history_arrays(j)):
+            numpy.copyto(aj, ai)
+
+    def history_arrays(self, i):
+        """Historic wavefunctions and auxiliary field configurations.
+
+        Parameters
+        ----------
+        i : int
+            Walker index.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Views of historic data of walker i. Empty if not stored.
+        """
+        if not self.history:
+            return []
+        fc = self.walkers[i].field_configs
+        return [self.phi_old[i], self.phi_init[i], self.phi_bp[i], fc.configs,
+                fc.cos_fac, fc.weight_fac]
+
+    def get_buffer(self, i):
+        """Get buffer of walker i for MPI communication
+
+        Parameters
+        ----------
+        i : int
+            Walker index.
+
+        Returns
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        buff = {
+            'phi': self.phi[i],
+            'weight': self.weight[i],
+            'inv_ovlp': [self.inv_ovlp[0][i], self.inv_ovlp[1][i]],
+            'G': self.G[i],
+            'log_overlap': self.log_ot[i],
+            'E_L': self.E_L[i],
+            'history': self.history_arrays(i)
+        }
+        return buff
+
+    def set_buffer(self, i, buff):
+        """Set buffer of walker i following MPI communication
+
+        Parameters
+        -------
+        i : int
+            Walker index.
+        buff : dict
+            Relevant walker information for population control.
+        """
+        self.phi[i] = buff['phi']
+        self.inv_ovlp[0][i] = buff['inv_ovlp'][0]
+        self.inv_ovlp[1][i] = buff['inv_ovlp'][1]
+        self.G[i] = buff['G']
+        self.weight[i] = buff['weight']
+        self.log_ot[i] = buff['log_overlap']
+        self.E_L[i] = buff['E_L']
+        for (a, b) in zip(self.history_arrays(i), buff['history']):
+            numpy.copyto(a, b)
+        self.invalidate(i)
+
+    def buffer_arrays(self, i):
+        """Data of walker i communicated during population control.
+
+        Only data which can't be cheaply recomputed is included.
+
+        Parameters
+        ----------
+        i : int
+            Walker index.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Views of walker data.
+        """
+        # Real and imaginary parts of log_ot are sent separately so that
+        # the buffer remains real for real walkers.
+        return ([self.weight[i:i+1], self.log_ot.real[i:i+1],
+                 self.log_ot.imag[i:i+1], self.E_L[i:i+1], self.phi[i]] +
+                self.history_arrays(i))
+
+    def walker_weights(self):
+        """Weights of walkers.
+
+        Returns
+        -------
+        weights : :class:`numpy.ndarray`
+            Walkers' weights.
+        """
+        return numpy.copy(self.weight)
+
+    def set_walker_weights(self, weights, index=slice(None)):
+        """Set weights of walkers.
+
+        Parameters
+        ----------
+        weights : float or :class:`numpy.ndarray`
+            New weights. A single value is given to all walkers in index.
+        index : slice or :class:`numpy.ndarray`, optional
+            Walkers to update. Default all.
+        """
+        self.weight[index] = weights
+
+    def buffer_layout(self):
+        """Construct layout of contiguous buffer for MPI communication.
+
+        Returns
+        -------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        """
+        return WalkerBuffer(self.buffer_arrays(0))
+
+    def pack_walker(self, i, buff):
+        """Pack walker i into contiguous buffer for MPI communication.
+
+        Parameters
+        ----------
+        i : int
+            Walker index.
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        """
+        self.buffer.pack(buff, self.buffer_arrays(i))
+
+    def unpack_walkers(self, index, buffs, trial):
+        """Unpack walkers from contiguous buffers.
+
+        The inverse overlap matrices and Green's functions of all the
+        unpacked walkers are then rebuilt together.
+
+        Parameters
+        ----------
+        index : :class:`numpy.ndarray`
+            Indices of walkers to unpack.
+        buffs : list of :class:`numpy.ndarray`
+            Buffer of each walker.
+        trial : object
+            Trial wavefunction object.
+        """
+        for (j, buff) in zip(index, buffs):
+            self.buffer.unpack(buff, self.buffer_arrays(j))
+        self.inverse_overlap(trial, index)
+        self.greens_function(trial, index)
+
+    def refill(self, comm, trial, costs=None):
+        """Replace inactive walkers by splitting active walkers.
+
+        See :meth:`pauxy.walkers.handler.PopulationControl.refill`. Refilled
+        walkers are marked as alive.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker.
+        """
+        super(WalkerBatch, self).refill(comm, trial, costs)
+        self.alive[numpy.abs(self.weight) > 1e-8] = 1
+
+    def compact(self):
+        """Move active walkers into a contiguous block at the start.
+
+        Inactive walkers at the start are overwritten by active walkers from
+        the end, which then become inactive. Following this
+        :meth:`active_walkers` returns a slice, so batched kernels can act on
+        views rather than copies of the walkers' data.
+        """
+        active = self.active_mask()
+        nactive = numpy.sum(active)
+        holes = numpy.where(~active[:nactive])[0]
+        tail = numpy.where(active[nactive:])[0] + nactive
+        for (i, j) in zip(tail, holes):
+            self.copy_walker(i, j)
+            self.alive[j] = 1
+        self.weight[tail] = 0.0
+
+
+class SpinBlocks(object):
+    """Per walker view of quantities stored separately for each spin sector.
+
+    Parameters
+    ----------
+    blocks : list of :class:`numpy.ndarray`
+        Stacked arrays for each spin sector.
+    index : int
+        Walker index.
+    """
+
+    def __init__(self, blocks, index):
+        self.blocks = blocks
+        self.index = index
+
+    def __getitem__(self, spin):
+        return self.blocks[spin][self.index]
+
+    def __setitem__(self, spin, value):
+        self.blocks[spin][self.index] = value
+
+    def __len__(self):
+        return len(self.blocks)
+
+
+class BatchWalker(SingleDetWalker):
+    """View of a single walker stored in a :class:`WalkerBatch`.
+
+    Provides the same interface as :class:`SingleDetWalker` but reads and
+    writes the walker's data directly from the batch's stacked arrays.
+
+    Parameters
+    ----------
+    batch : :class:`WalkerBatch`
+        Container storing the walker.
+    index : int
+        Walker index within batch.
+    """
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+        self.nup = batch.nup
+        self.field_configs = None
+        # interface consistency
+        self.ots = numpy.zeros(1)
+        self.weights = numpy.array([1])
+
+    @property
+    def phi(self):
+        return self.batch.phi[self.index]
+
+    @phi.setter
+    def phi(self, value):
+        self.batch.phi[self.index] = value
+
+    @property
+    def phi_old(self):
+        return self.batch.phi_old[self.index]
+
+    @phi_old.setter
+    def phi_old(self, value):
+        self.batch.phi_old[self.index] = value
+
+    @property
+    def phi_init(self):
+        return self.batch.phi_init[self.index]
+
+    @phi_init.setter
+    def phi_init(self, value):
+        self.batch.phi_init[self.index] = value
+
+    @property
+    def phi_bp(self):
+        return self.batch.phi_bp[self.index]
+
+    @phi_bp.setter
+    def phi_bp(self, value):
+        self.batch.phi_bp[self.index] = value
+
+    @property
+    def G(self):
+        return self.batch.G[self.index]
+
+    @G.setter
+    def G(self, value):
+        self.batch.G[self.index] = value
+
+    @property
+    def Gmod(self):
+        return self.batch.Gmod[self.index]
+
+    @Gmod.setter
+    def Gmod(self, value):
+        self.batch.Gmod[self.index] = value
+
+    @property
+    def inv_ovlp(self):
+        return SpinBlocks(self.batch.inv_ovlp, self.index)
+
+    @inv_ovlp.setter
+    def inv_ovlp(self, value):
+        self.batch.inv_ovlp[0][self.index] = value[0]
+        self.batch.inv_ovlp[1][self.index] = value[1]
+
+    @property
+    def weight(self):
+        return self.batch.weight[self.index]
+
+    @weight.setter
+    def weight(self, value):
+        self.batch.weight[self.index] = value
+
+    @property
+    def log_ot(self):
+        return self.batch.log_ot[self.index]
+
+    @log_ot.setter
+    def log_ot(self, value):
+        self.batch.log_ot[self.index] = value
+
+    @property
+    def log_ovlp(self):
+        return self.batch.log_ovlp[self.index]
+
+    @log_ovlp.setter
+    def log_ovlp(self, value):
+        self.batch.log_ovlp[self.index] = value
+
+    @property
+    def E_L(self):
+        return self.batch.E_L[self.index]
+
+    @E_L.setter
+    def E_L(self, value):
+        self.batch.E_L[self.index] = value
+
+    @property
+    def dirty(self):
+        return self.batch.dirty[self.index]
+
+    @dirty.setter
+    def dirty(self, value):
+        self.batch.dirty[self.index] = value
+
+    @property
+    def energy(self):
+        if self.batch.energy_valid[self.index]:
+            return tuple(self.batch.energy[self.index])
+        else:
+            return None
+
+    @energy.setter
+    def energy(self, value):
+        if value is None:
+            self.batch.energy_valid[self.index] = False
+        else:
+            self.batch.energy[self.index] = value
+            self.batch.energy_valid[self.index] = True
+
+    @property
+    def alive(self):
+        return self.batch.alive[self.index]
+
+    @alive.setter
+    def alive(self, value):
+        self.batch.alive[self.index] = value
+
+    def get_buffer(self):
+        """Get walker buffer for MPI communication
+
+        Returns
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        return self.batch.get_buffer(self.index)
+
+    def set_buffer(self, buff):
+        """Set walker buffer following MPI communication
+
+        Parameters
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        self.batch.set_buffer(self.index, buff)
@@ -0,0 +1,88 @@
+import numpy
+
+
+class WalkerBuffer(object):
+    """Contiguous buffers used to communicate walkers between processors.
+
+    Walkers are packed into a single flat array so that they can be sent using
+    buffer based (non-pickled) MPI communication. The layout is fixed on
+    construction from a template walker's data.
+
+    Parameters
+    ----------
+    arrays : list of :class:`numpy.ndarray`
+        Walker data to be communicated.
+    nscalars : int
+        Number of scalars stored at the start of the buffer.
+
+    Attributes
+    ----------
+    size : int
+        Number of elements required to store a single walker.
+    dtype : type
+        Buffer type.
+    send : :class:`numpy.ndarray`
+        Buffers for walkers being sent. Shape (nbuff, size).
+    recv : :class:`numpy.ndarray`
+        Buffers for walkers being received. Shape (nbuff, size).
+    """
+
+    def __init__(self, arrays, nscalars=0):
+        self.nscalars = nscalars
+        self.shapes = [a.shape for a in arrays]
+        self.offsets = numpy.cumsum([nscalars]+[a.size for a in arrays])
+        self.size = self.offsets[-1]
+        self.dtype = numpy.result_type(*arrays)
+        self.send = numpy.zeros(shape=(0, self.size), dtype=self.dtype)
+        self.recv = numpy.zeros(shape=(0, self.size), dtype=self.dtype)
+
+    def reserve(self, nbuff):
+        """Make sure there are at least nbuff send and receive buffers.
+
+        Parameters
+        ----------
+        nbuff : int
+            Number of buffers required.
+        """
+        if nbuff > len(self.send):
+            self.send = numpy.zeros(shape=(nbuff, self.size), dtype=self.dtype)
+            self.recv = numpy.zeros(shape=(nbuff, self.size), dtype=self.dtype)
+
+    def pack(self, buff, arrays, scalars=()):
+        """Pack walker data into buffer.
+
+        Parameters
+        ----------
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        arrays : list of :class:`numpy.ndarray`
+            Walker data.
+        scalars : tuple
+            Scalar walker data.
+        """
+        buff[:self.nscalars] = scalars
+        for (a, s, e) in zip(arrays, self.offsets[:-1], self.offsets[1:]):
+            buff[s:e] = a.ravel()
+
+    def unpack(self, buff, arrays):
+        """Unpack walker data from buffer.
+
+        Parameters
+        ----------
+        buff : :class:`numpy.ndarray`
+            Buffer to unpack.
+        arrays : list of :class:`numpy.ndarray`
+            Walker data. Updated inplace.
+
+        Returns
+        -------
+        scalars : :class:`numpy.ndarray`
+            Scalar walker data.
+        """
+        for (a, shape, s, e) in zip(arrays, self.shapes, self.offsets[:-1],
+                                    self.offsets[1:]):
+            data = buff[s:e].reshape(shape)
+            if not numpy.iscomplexobj(a):
+                data = data.real
+            a[...] = data
+        return numpy.copy(buff[:self.nscalars])
@@ -1,12 +1,285 @@
 import copy
 import numpy
 import math
+import tempfile
+try:
+    from mpi4py import MPI
+    mpi_sum = MPI.SUM
+    mpi_max = MPI.MAX
+    mpi_shared = MPI.COMM_TYPE_SHARED
+except ImportError:
+    mpi_sum = None
+    mpi_max = None
+    mpi_shared = None
 import scipy.linalg
+from pauxy.utils.linalg import condition_estimate
+from pauxy.walkers.multi_det_table import MultiDetTableWalker
 from pauxy.walkers.multi_ghf import MultiGHFWalker
+from pauxy.walkers.rhf import RHFWalker
 from pauxy.walkers.single_det import SingleDetWalker
 
 
-class Walkers(object):
+class PopulationControl(object):
+    """Population control shared by the walker containers.
+
+    Implements the comb, stochastic reconfiguration, split / join and refill
+    methods of population control, including the (asynchronous)
+    communication of walkers between processors. Containers only need to
+    provide access to individual walker slots through the following methods:
+
+    * walker_weights() and set_walker_weights(weights, index) to get and set
+      the walkers' weights.
+    * active_mask() to flag walkers which should be propagated.
+    * copy_walker(i, j) to overwrite walker j with a copy of walker i.
+    * buffer_layout() to construct a
+      :class:`pauxy.walkers.buffer.WalkerBuffer` for a single walker.
+    * pack_walker(i, buff) to pack walker i into a contiguous buffer.
+    * unpack_walkers(index, buffs, trial) to unpack walkers from their
+      buffers and rebuild any derived quantities.
+
+    Containers also need to set the number of walkers per processor, nw.
+    """
+
+    def __init__(self):
+        self.pop_control = self.comb
+        self.ncomb = 0
+        # Contiguous buffers for communicating walkers, allocated when first
+        # needed.
+        self.buffer = None
+        # Outstanding communication from asynchronous population control.
+        self.pending_sends = []
+        self.pending_recvs = {}
+        self.reset_weight = 1.0
+        # Log of the weight factor removed from walkers by stochastic
+        # reconfiguration.
+        self.log_weight_factor = 0.0
+
+    def comb(self, comm, trial, costs=None, wait=True, normalise=True):
+        """Apply the comb method of population control / branching.
+
+        See Booth & Gubernatis PRE 80, 046704 (2009).
+
+        The comb is distributed across processors, see :func:`comb_copies`
+        and :func:`comb_exchange`. Only walkers which are replicated are
+        copied, into the slots of killed walkers. Walkers which remain on the
+        same processor are copied in place, otherwise they are packed into
+        contiguous buffers, see :class:`pauxy.walkers.buffer.WalkerBuffer`.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker. If present used to
+            decide which walkers are moved between processors, see
+            :func:`comb_exchange`. The driver passes the time spent
+            propagating each walker since the last population control step.
+        wait : bool, optional
+            If False return once communication has been posted. Walkers being
+            received must then be completed with :meth:`wait_walker` or
+            :meth:`wait_comb` before they are used. Default True.
+        normalise : bool, optional
+            If True walker weights are reset to one, otherwise to the mean
+            walker weight, which preserves the total weight on comm. Default
+            True.
+        """
+        # Send buffers from the previous call may still be in use.
+        self.wait_comb(trial)
+        # todo : add phase to walker for free projection
+        weights = numpy.abs(self.walker_weights())
+        (ncopies, total_weight) = comb_copies(comm, weights, self.nw)
+        self.exchange(comm, ncopies, costs)
+        # Reset walker weight.
+        self.mean_weight = total_weight / (self.nw*comm.size)
+        if normalise:
+            self.reset_weight = 1.0
+        else:
+            self.reset_weight = self.mean_weight
+        self.set_walker_weights(self.reset_weight)
+        if wait:
+            self.wait_comb(trial)
+
+    def exchange(self, comm, ncopies, costs=None):
+        """Copy and communicate walkers following population control.
+
+        Walkers being received are left pending, see :meth:`wait_walker`.
+        Walkers pending from a previous call must have been received first,
+        see :meth:`wait_comb`.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        ncopies : :class:`numpy.ndarray`
+            Number of copies of each walker on this processor.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker.
+        """
+        (sends, copies, recvs) = comb_exchange(comm, ncopies, self.nw, costs,
+                                               self.ncomb)
+        self.ncomb += 1
+        # Send buffers can only be reused once earlier sends have completed.
+        for rs in self.pending_sends:
+            rs.Wait()
+        self.pending_sends = []
+        if self.buffer is None and (len(sends) > 0 or len(recvs) > 0):
+            self.buffer = self.buffer_layout()
+        if self.buffer is not None:
+            # A heavy walker can be sent to several processors so there may
+            # be more sends than walkers.
+            self.buffer.reserve(max(len(sends), len(recvs)))
+        for (k, (i, dest, tag)) in enumerate(sends):
+            self.pack_walker(i, self.buffer.send[k])
+            self.pending_sends.append(comm.Isend(self.buffer.send[k],
+                                                 dest=dest, tag=tag))
+        for (i, j) in copies:
+            self.copy_walker(i, j)
+        for (k, (j, tag)) in enumerate(recvs):
+            self.pending_recvs[j] = (comm.Irecv(self.buffer.recv[k], tag=tag),
+                                     k)
+
+    def refill(self, comm, trial, costs=None):
+        """Replace inactive walkers by splitting active walkers.
+
+        Cheaper than full population control as no walkers are killed, see
+        :func:`refill_copies`. Walkers move to processors with inactive
+        walkers as in :meth:`comb`.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker.
+        """
+        self.wait_comb(trial)
+        weights = self.walker_weights()
+        ncopies = refill_copies(comm, weights, self.active_mask())
+        self.set_walker_weights(weights/numpy.maximum(ncopies, 1))
+        # Walkers keep their weights.
+        self.reset_weight = None
+        self.exchange(comm, ncopies, costs)
+        self.wait_comb(trial)
+
+    def hierarchical_comb(self, comm, trial, costs=None, wait=True):
+        """Comb within a node and occasionally across nodes.
+
+        See :class:`HierarchicalSchedule`.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker.
+        wait : bool, optional
+            If False return once communication has been posted. Default True.
+        """
+        weights = numpy.abs(self.walker_weights())
+        (comm, normalise) = self.schedule.select(comm, weights)
+        self.comb(comm, trial, costs=costs, wait=wait, normalise=normalise)
+
+    def stochastic_reconfiguration(self, comm, trial, costs=None, wait=True):
+        """Stochastic reconfiguration with a fixed number of walkers.
+
+        Walkers are selected using the comb, see :meth:`comb`. The mean
+        walker weight removed when resetting the weights is accumulated in
+        log_weight_factor, which the mixed estimator uses to keep the walker
+        weights of a block consistently normalised and writes to the output,
+        see :meth:`pauxy.estimators.mixed.Mixed.weight_factor`.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Measured cost of propagating each walker.
+        wait : bool, optional
+            If False return once communication has been posted. Default True.
+        """
+        self.comb(comm, trial, costs=costs, wait=wait)
+        self.log_weight_factor += numpy.log(self.mean_weight)
+
+    def split_join(self, comm, trial, costs=None, wait=True):
+        """Split / join walkers whose weights lie outside a window.
+
+        Only walkers on this processor are involved, see
+        :func:`split_join_moves`. The window is set by the split_join_window
+        attribute.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+            Not used.
+        trial : object
+            Trial wavefunction object.
+        costs : :class:`numpy.ndarray`, optional
+            Not used.
+        wait : bool, optional
+            Not used.
+        """
+        self.wait_comb(trial)
+        (copies, weights) = split_join_moves(self.walker_weights(),
+                                             self.split_join_window)
+        for (i, j) in copies:
+            self.copy_walker(i, j)
+        self.set_walker_weights(weights)
+
+    def wait_walker(self, j, trial):
+        """Complete the population control of walker j.
+
+        Does nothing unless walker j is still being received following an
+        asynchronous call to :meth:`comb`.
+
+        Parameters
+        ----------
+        j : int
+            Walker index.
+        trial : object
+            Trial wavefunction object.
+        """
+        if j in self.pending_recvs:
+            self.receive_walkers([j], trial)
+
+    def wait_comb(self, trial):
+        """Complete all outstanding population control communication.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        """
+        if len(self.pending_recvs) > 0:
+            self.receive_walkers(list(self.pending_recvs.keys()), trial)
+        for rs in self.pending_sends:
+            rs.Wait()
+        self.pending_sends = []
+
+    def receive_walkers(self, index, trial):
+        """Wait for and unpack walkers being received.
+
+        Parameters
+        ----------
+        index : list
+            Indices of walkers being received.
+        trial : object
+            Trial wavefunction object.
+        """
+        buffs = []
+        for j in index:
+            (req, k) = self.pending_recvs.pop(j)
+            req.Wait()
+            buffs.append(self.buffer.recv[k])
+        index = numpy.array(index)
+        self.unpack_walkers(index, buffs, trial)
+        if self.reset_weight is not None:
+            self.set_walker_weights(self.reset_weight, index)
+
+
+class Walkers(PopulationControl):
     """Container for groups of walkers which make up a wavefunction.
 
     Parameters
@@ -21,22 +294,44 @@ class Walkers(object):
         Total number of propagators to store for back propagation + itcf.
     nbp : int
         Number of back propagation steps.
+    field_precision : string, optional
+        Precision of stored continuous auxiliary fields, 'double' or
+        'single'. Default 'double'.
+    scratch : string, optional
+        If present auxiliary field configurations are stored in a memory
+        mapped file in this directory. Default None.
+    history : bool, optional
+        If True store historic wavefunctions and auxiliary field
+        configurations, which are only required for back propagation and
+        ITCFs. Default True.
+    restricted : bool, optional
+        If True use spin restricted walkers, see
+        :class:`pauxy.walkers.rhf.RHFWalker`. Default False.
     """
 
-    def __init__(self, system, trial, nwalkers, nprop_tot, nbp, verbose=False):
+    def __init__(self, system, trial, nwalkers, nprop_tot, nbp, verbose=False,
+                 field_precision='double', scratch=None, history=True,
+                 restricted=False):
         if trial.name == 'multi_determinant':
-            if trial.type == 'GHF':
-                self.walkers = [MultiGHFWalker(1, system, trial)
-                                for w in range(nwalkers)]
-        else:
-            self.walkers = [SingleDetWalker(1, system, trial, w)
-                            for w in range(nwalkers)]
-        if system.name == "Generic":
-            dtype = complex
+            if trial.expansion == 'excitations':
+                walker = MultiDetTableWalker(1, system, trial,
+                                             history=history)
+            elif trial.type == 'GHF':
+                walker = MultiGHFWalker(1, system, trial, history=history)
+        elif restricted:
+            walker = RHFWalker(1, system, trial, history=history)
         else:
-            dtype = int
-        self.pop_control = self.comb
-        self.add_field_config(nprop_tot, nbp, system.nfields, dtype)
+            walker = SingleDetWalker(1, system, trial, history=history)
+        # Every walker starts in the same state so the initial determinant and
+        # the quantities derived from it are only constructed once.
+        self.walkers = [walker] + [copy.deepcopy(walker)
+                                   for w in range(nwalkers-1)]
+        self.history = history
+        dtype = field_config_dtype(system, field_precision)
+        super(Walkers, self).__init__()
+        if history:
+            self.add_field_config(nprop_tot, nbp, system.nfields, dtype,
+                                  scratch)
         self.calculate_total_weight()
         self.calculate_nwalkers()
 
@@ -46,8 +341,8 @@ class Walkers(object):
     def calculate_nwalkers(self):
         self.nw = sum(w.alive for w in self.walkers)
 
-    def orthogonalise(self, trial, free_projection):
-        """Orthogonalise all walkers.
+    def orthogonalise(self, trial, free_projection, threshold=None):
+        """Orthogonalise walkers.
 
         Parameters
         ----------
@@ -55,13 +350,23 @@ class Walkers(object):
             Trial wavefunction object.
         free_projection : bool
             True if doing free projection.
+        threshold : float, optional
+            If present only orthogonalise walkers for which the estimated
+            condition number of either spin sector exceeds threshold, see
+            :func:`pauxy.utils.linalg.condition_estimate`. Default None
+            (orthogonalise all walkers).
         """
         for w in self.walkers:
+            if threshold is not None:
+                cond = max(condition_estimate(w.phi[:,:w.nup]),
+                           condition_estimate(w.phi[:,w.nup:]))
+                if cond < threshold:
+                    continue
             detR = w.reortho(trial)
             if free_projection:
                 w.weight = detR * w.weight
 
-    def add_field_config(self, nprop_tot, nbp, nfields, dtype):
+    def add_field_config(self, nprop_tot, nbp, nfields, dtype, scratch=None):
         """Add FieldConfig object to walker object.
 
         Parameters
@@ -74,9 +379,15 @@ class Walkers(object):
             Number of fields to store for each back propagation step.
         dtype : type
             Field configuration type.
+        scratch : string, optional
+            Directory for memory mapped field configurations, see
+            :func:`allocate_field_configs`.
         """
-        for w in self.walkers:
-            w.field_configs = FieldConfig(nfields, nprop_tot, nbp, dtype)
+        configs = allocate_field_configs(len(self.walkers), nprop_tot,
+                                         nfields, dtype, scratch)
+        for (iw, w) in enumerate(self.walkers):
+            w.field_configs = FieldConfig(nfields, nprop_tot, nbp, dtype,
+                                          configs=configs[iw])
 
     def copy_historic_wfn(self):
         """Copy current wavefunction to psi_n for next back propagation step."""
@@ -103,85 +414,479 @@ class Walkers(object):
         for (i,w) in enumerate(self.walkers):
             numpy.copyto(self.walkers[i].phi_init, self.walkers[i].phi)
 
-    def comb(self, comm):
-        """Apply the comb method of population control / branching.
+    def active_walkers(self):
+        """Indices of walkers which should be propagated.
 
-        See Booth & Gubernatis PRE 80, 046704 (2009).
+        Returns
+        -------
+        index : :class:`numpy.ndarray`
+            Indices of alive walkers with non-negligible weight.
+        """
+        return numpy.where(self.active_mask())[0]
+
+    def active_mask(self):
+        """Mask of walkers which should be propagated.
+
+        Returns
+        -------
+        mask : :class:`numpy.ndarray`
+            True for alive walkers with non-negligible weight.
+        """
+        return numpy.array([abs(w.weight) > 1e-8 and w.alive
+                            for w in self.walkers], dtype=bool)
+
+    def walker_weights(self):
+        """Weights of walkers.
+
+        Returns
+        -------
+        weights : :class:`numpy.ndarray`
+            Walkers' weights.
+        """
+        return numpy.array([w.weight for w in self.walkers])
+
+    def set_walker_weights(self, weights, index=None):
+        """Set weights of walkers.
+
+        Parameters
+        ----------
+        weights : float or :class:`numpy.ndarray`
+            New weights. A single value is given to all walkers in index.
+        index : :class:`numpy.ndarray`, optional
+            Walkers to update. Default all.
+        """
+        if index is None:
+            index = range(len(self.walkers))
+        weights = numpy.broadcast_to(weights, (len(index),))
+        for (j, weight) in zip(index, weights):
+            self.walkers[j].weight = weight
+
+    def copy_walker(self, i, j):
+        """Overwrite walker j with a copy of walker i.
+
+        Parameters
+        ----------
+        i : int
+            Index of walker to copy.
+        j : int
+            Index of walker to overwrite.
+        """
+        self.walkers[j].set_buffer(self.walkers[i].get_buffer())
+
+    def buffer_layout(self):
+        """Construct layout of contiguous buffer for MPI communication.
+
+        Returns
+        -------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        """
+        return self.walkers[0].buffer_layout()
+
+    def pack_walker(self, i, buff):
+        """Pack walker i into contiguous buffer for MPI communication.
+
+        Parameters
+        ----------
+        i : int
+            Walker index.
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        """
+        self.walkers[i].pack(self.buffer, buff)
+
+    def unpack_walkers(self, index, buffs, trial):
+        """Unpack walkers from contiguous buffers.
+
+        Parameters
+        ----------
+        index : :class:`numpy.ndarray`
+            Indices of walkers to unpack.
+        buffs : list of :class:`numpy.ndarray`
+            Buffer of each walker.
+        trial : object
+            Trial wavefunction object.
+        """
+        for (j, buff) in zip(index, buffs):
+            self.walkers[j].unpack(self.buffer, buff, trial)
+
+def comb_copies(comm, weights, nw):
+    """Find the number of copies of each walker selected by the comb.
+
+    See Booth & Gubernatis PRE 80, 046704 (2009).
+
+    Walkers are ordered by processor so that each processor owns a contiguous
+    interval of the cumulative weight. Processors only need the total weight
+    and the weight of the preceding processors (via a prefix sum) to place
+    their own teeth of the comb, so no walker weights are gathered.
+
+    Parameters
+    ----------
+    comm : MPI communicator
+    weights : :class:`numpy.ndarray`
+        Absolute value of the weights of the walkers on this processor.
+    nw : int
+        Target number of walkers per processor.
+
+    Returns
+    -------
+    ncopies : :class:`numpy.ndarray`
+        Number of copies of each walker on this processor.
+    total_weight : float
+        Total weight of walkers on all processors.
+    """
+    cprobs = numpy.cumsum(weights)
+    local_weight = numpy.array([cprobs[-1]])
+    total_weight = numpy.zeros(1)
+    offset = numpy.zeros(1)
+    comm.Allreduce(local_weight, total_weight, op=mpi_sum)
+    comm.Exscan(local_weight, offset, op=mpi_sum)
+    r = numpy.zeros(1)
+    if comm.rank == 0:
+        offset[:] = 0.0
+        r[:] = numpy.random.random()
+    comm.Bcast(r, root=0)
+    ntarget = nw * comm.size
+    spacing = total_weight[0] / ntarget
+    # Teeth (k+r)*spacing lying in [offset, offset+local_weight). The first
+    # tooth is taken from the last tooth of the preceding processor so that
+    # rounding errors in the prefix sum can't lose or duplicate a tooth.
+    if comm.rank == comm.size - 1:
+        end = numpy.array([ntarget], dtype='i')
+    else:
+        end = numpy.array([math.ceil((offset[0]+local_weight[0])/spacing
+                                     - r[0])], dtype='i')
+        end = numpy.clip(end, 0, ntarget)
+    start = numpy.zeros(1, dtype='i')
+    comm.Exscan(end, start, op=mpi_max)
+    if comm.rank == 0:
+        start[:] = 0
+    comb = (numpy.arange(start[0], end[0])+r[0]) * spacing
+    # Walker selected by each tooth of the comb.
+    parents = numpy.searchsorted(offset[0]+cprobs, comb, side='right')
+    parents = numpy.minimum(parents, len(cprobs)-1)
+    return (numpy.bincount(parents, minlength=len(cprobs)), total_weight[0])
+
+
+def refill_copies(comm, weights, active):
+    """Find the number of copies of each walker used to refill inactive slots.
+
+    Active walkers are split into copies carrying equal shares of their
+    weight, so no walkers are killed and the total weight is unchanged. Each
+    processor makes a number of extra copies proportional to its share of
+    the total weight, found using prefix sums as in :func:`comb_copies`, so
+    that the number of inactive walkers summed over processors are replaced.
+    Extra copies are given to the walkers with the largest weight per copy.
+
+    Parameters
+    ----------
+    comm : MPI communicator
+    weights : :class:`numpy.ndarray`
+        Weights of the walkers on this processor.
+    active : :class:`numpy.ndarray`
+        True for active walkers.
+
+    Returns
+    -------
+    ncopies : :class:`numpy.ndarray`
+        Number of copies of each walker on this processor.
+    """
+    weights = numpy.where(active, numpy.abs(weights), 0.0)
+    ncopies = active.astype(int)
+    local = numpy.array([numpy.sum(weights), numpy.sum(~active)], dtype=float)
+    total = numpy.zeros(2)
+    offset = numpy.zeros(2)
+    comm.Allreduce(local, total, op=mpi_sum)
+    comm.Exscan(local, offset, op=mpi_sum)
+    if comm.rank == 0:
+        offset[:] = 0.0
+    ninactive = int(round(total[1]))
+    if ninactive == 0 or total[0] == 0.0:
+        return ncopies
+    if comm.rank == comm.size - 1:
+        end = numpy.array([ninactive], dtype='i')
+    else:
+        end = numpy.array([math.floor(ninactive*(offset[0]+local[0])
+                                      / total[0])], dtype='i')
+        end = numpy.clip(end, 0, ninactive)
+    start = numpy.zeros(1, dtype='i')
+    comm.Exscan(end, start, op=mpi_max)
+    if comm.rank == 0:
+        start[:] = 0
+    for n in range(end[0]-start[0]):
+        i = numpy.argmax(weights/numpy.maximum(ncopies, 1))
+        ncopies[i] += 1
+    return ncopies
+
+
+def comb_exchange(comm, ncopies, nw, costs=None, ncomb=0):
+    """Plan the exchange of walkers following the comb.
+
+    The new walkers are ordered by processor, so that processor p holds
+    global positions [C_p, C_p+M_p), where M_p is the number of walkers it
+    generated and C_p is found by a prefix sum. Processor p should end up
+    holding positions [p*nw, (p+1)*nw), so surplus walkers are only sent to
+    the processors whose blocks overlap, typically neighbours. Received
+    walkers are matched by their position in the receiving block.
+
+    Parameters
+    ----------
+    comm : MPI communicator
+    ncopies : :class:`numpy.ndarray`
+        Number of copies of each walker on this processor.
+    nw : int
+        Number of walkers per processor.
+    costs : :class:`numpy.ndarray`, optional
+        Cost of each walker. Processors whose new walkers are more expensive
+        than average send out their most expensive walkers, otherwise their
+        cheapest.
+    ncomb : int, optional
+        Number of previous calls. Alternates the tags used so that messages
+        from consecutive calls can't be confused.
+
+    Returns
+    -------
+    sends : list of tuples
+        (index, processor, tag) of walkers to send.
+    copies : list of tuples
+        (source, destination) indices of walkers to copy on this processor.
+    recvs : list of tuples
+        (index, tag) of slots receiving walkers.
+    """
+    nnew = numpy.array([numpy.sum(ncopies)], dtype='i')
+    first = numpy.zeros(1, dtype='i')
+    comm.Exscan(nnew, first, op=mpi_sum)
+    if comm.rank == 0:
+        first[:] = 0
+    (first, nnew) = (first[0], nnew[0])
+    block = comm.rank * nw
+    nlower = min(nnew, max(0, block-first))
+    nhigher = min(nnew-nlower, max(0, first+nnew-block-nw))
+    nsend = nlower + nhigher
+    # Walkers sent are taken from the end.
+    new = numpy.repeat(numpy.arange(len(ncopies)), ncopies)
+    if costs is not None and nsend > 0:
+        local_cost = numpy.array([numpy.dot(ncopies, costs)])
+        total_cost = numpy.zeros(1)
+        comm.Allreduce(local_cost, total_cost, op=mpi_sum)
+        order = numpy.argsort(costs[new], kind='stable')
+        if local_cost[0] < total_cost[0] / comm.size:
+            order = order[::-1]
+        new = new[order]
+    elif costs is not None:
+        # Every processor has to take part in the reduction.
+        comm.Allreduce(numpy.zeros(1), numpy.zeros(1), op=mpi_sum)
+    sent = new[nnew-nsend:]
+    positions = numpy.concatenate(
+        (numpy.arange(first, first+nlower),
+         numpy.arange(first+nnew-nhigher, first+nnew))
+    )
+    tag_offset = (ncomb % 2) * nw
+    sends = list(zip(sent, positions//nw, positions%nw+tag_offset))
+    # Copies kept on this processor.
+    nkeep = ncopies - numpy.bincount(sent, minlength=len(ncopies))
+    free = numpy.where(nkeep == 0)[0]
+    extra = numpy.repeat(numpy.arange(len(ncopies)),
+                         numpy.maximum(nkeep-1, 0))
+    copies = list(zip(extra, free[:len(extra)]))
+    # Positions in this processor's block not generated here.
+    slots = numpy.arange(nw)
+    missing = slots[(block+slots < first) | (block+slots >= first+nnew)]
+    recvs = list(zip(free[len(extra):], missing+tag_offset))
+    return (sends, copies, recvs)
+
+
+def split_join_moves(weights, window):
+    """Find walkers to split and join.
+
+    Walkers whose weight relative to the mean is above window[1] are split in
+    two, and pairs of walkers below window[0] are joined, keeping one of the
+    pair with probability proportional to its weight. Each join frees a slot
+    for one split so the number of walkers is fixed. Walkers with zero weight,
+    e.g., those killed by the constraint, are used as free slots for splits
+    before any walkers are joined. Walkers outside the window which can't be
+    paired are left for later calls.
+
+    Parameters
+    ----------
+    weights : :class:`numpy.ndarray`
+        Weights of walkers on this processor.
+    window : tuple
+        Lower and upper relative weights.
+
+    Returns
+    -------
+    copies : list of tuples
+        (source, destination) indices of walkers to copy.
+    weights : :class:`numpy.ndarray`
+        New walker weights.
+    """
+    weights = numpy.array(weights)
+    aw = numpy.abs(weights)
+    mean = numpy.mean(aw)
+    copies = []
+    if mean == 0.0:
+        return (copies, weights)
+    heavy = numpy.where(aw > window[1]*mean)[0]
+    heavy = heavy[numpy.argsort(aw[heavy])[::-1]]
+    free = list(numpy.where(aw == 0.0)[0])
+    light = numpy.where((aw > 0.0) & (aw < window[0]*mean))[0]
+    light = light[numpy.argsort(aw[light])]
+    njoin = 0
+    for i in heavy:
+        if len(free) > 0:
+            slot = free.pop(0)
+        elif 2*njoin + 2 <= len(light):
+            (a, b) = light[2*njoin:2*njoin+2]
+            njoin += 1
+            wab = aw[a] + aw[b]
+            if numpy.random.random() < aw[a] / wab:
+                (keep, slot) = (a, b)
+            else:
+                (keep, slot) = (b, a)
+            weights[keep] = wab * weights[keep] / aw[keep]
+        else:
+            break
+        weights[i] = 0.5 * weights[i]
+        weights[slot] = weights[i]
+        copies.append((i, slot))
+    return (copies, weights)
+
+
+class HierarchicalSchedule(object):
+    """Schedule for two level comb population control.
+
+    Walkers are combed amongst processors on the same node, which preserves
+    the total weight of each node, and only occasionally across all
+    processors. Processors on a node are found by splitting the communicator
+    by shared memory.
+
+    Parameters
+    ----------
+    ninternode : int
+        Comb across all processors every ninternode calls.
+    drift : float, optional
+        Also comb across all processors if the mean walker weight on any node
+        differs from the global mean weight by more than this fraction.
+    """
+
+    def __init__(self, ninternode, drift=None):
+        self.ninternode = ninternode
+        self.drift = drift
+        self.node_comm = None
+        self.ncalls = 0
+
+    def select(self, comm, weights):
+        """Select communicator for the next comb.
 
         Parameters
         ----------
         comm : MPI communicator
-        iproc : int
-            Current processor index
-        nprocs : int
-            Total number of mpi processors
+        weights : :class:`numpy.ndarray`
+            Absolute value of the weights of the walkers on this processor.
+
+        Returns
+        -------
+        comm : MPI communicator
+            Communicator to comb over.
+        normalise : bool
+            False if combing within a node, in which case the node's weight
+            must be preserved.
         """
-        # Need make a copy to since the elements in psi are only references to
-        # walker objects in memory. We don't want future changes in a given
-        # element of psi having unintended consequences.
-        new_psi = copy.deepcopy(self.walkers)
-        # todo : add phase to walker for free projection
-        weights = numpy.array([abs(w.weight) for w in self.walkers])
-        global_weights = numpy.zeros(len(weights)*comm.size)
-        if comm.rank == 0:
-            parent_ix = numpy.zeros(len(global_weights), dtype='i')
+        if self.node_comm is None:
+            self.node_comm = comm.Split_type(mpi_shared, key=comm.rank)
+        self.ncalls += 1
+        internode = self.ncalls % self.ninternode == 0
+        if not internode and self.drift is not None:
+            internode = self.node_drift(comm, weights) > self.drift
+        if internode:
+            return (comm, True)
         else:
-            parent_ix = numpy.empty(len(global_weights), dtype='i')
-
-        comm.Gather(weights, global_weights, root=0)
-        if comm.rank == 0:
-            total_weight = sum(global_weights)
-            cprobs = numpy.cumsum(global_weights)
-            ntarget = self.nw * comm.size
-
-            r = numpy.random.random()
-            comb = [(i+r) * (total_weight/(ntarget)) for i in range(ntarget)]
-            iw = 0
-            ic = 0
-            while ic < len(comb):
-                if comb[ic] < cprobs[iw]:
-                    parent_ix[iw] += 1
-                    ic += 1
-                else:
-                    iw += 1
-
-        # Wait for master
-        comm.Bcast(parent_ix, root=0)
-        # Copy back new information
-        send = []
-        recv = []
-        for (i, w) in enumerate(parent_ix):
-            # processor index of killed walker
-            if w == 0:
-                recv.append([i//self.nw, i%self.nw])
-            elif w > 1:
-                for ns in range(0, w-1):
-                    send.append([i//self.nw, i%self.nw])
-        # Send / Receive walkers.
-        reqs = []
-        reqr = []
-        walker_buffers = []
-        for i, (s,r) in enumerate(zip(send, recv)):
-            # don't want to access buffer during non-blocking send.
-            if (comm.rank == s[0]):
-                # Sending duplicated walker
-                walker_buffers.append(new_psi[s[1]].get_buffer())
-                reqs.append(comm.isend(walker_buffers[-1],
-                            dest=r[0], tag=i))
-        for i, (s,r) in enumerate(zip(send, recv)):
-            if str(comm.__class__) == 'pauxy.qmc.calc.FakeComm':
-                # no mpi4py
-                walker_buffer = walker_buffers[i]
-            else:
-                if (comm.rank == r[0]):
-                    walker_buffer = comm.recv(source=s[0], tag=i)
-                    self.walkers[r[1]].set_buffer(walker_buffer)
-        for rs in reqs:
-            rs.wait()
-        comm.Barrier()
-        # Reset walker weight.
-        for w in self.walkers:
-            w.weight = 1.0
+            return (self.node_comm, False)
+
+    def node_drift(self, comm, weights):
+        """Largest relative deviation of node mean weight from global mean.
+
+        Parameters
+        ----------
+        comm : MPI communicator
+        weights : :class:`numpy.ndarray`
+            Absolute value of the weights of the walkers on this processor.
+
+        Returns
+        -------
+        drift : float
+            Drift of node weights.
+        """
+        local_weight = numpy.array([numpy.sum(weights)])
+        node_weight = numpy.zeros(1)
+        total_weight = numpy.zeros(1)
+        self.node_comm.Allreduce(local_weight, node_weight, op=mpi_sum)
+        comm.Allreduce(local_weight, total_weight, op=mpi_sum)
+        drift = numpy.array([abs(node_weight[0]*comm.size
+                                 / (total_weight[0]*self.node_comm.size)
+                                 - 1.0)])
+        max_drift = numpy.zeros(1)
+        comm.Allreduce(drift, max_drift, op=mpi_max)
+        return max_drift[0]
+
+
+def field_config_dtype(system, precision='double'):
+    """Type used to store auxiliary field configurations.
+
+    Discrete fields are either 0 or 1 so are stored as single bytes.
+
+    Parameters
+    ----------
+    system : object
+        System object.
+    precision : string, optional
+        Precision of continuous fields, 'double' or 'single'.
+
+    Returns
+    -------
+    dtype : type
+        Field configuration type.
+    """
+    if system.name == "Generic":
+        if precision == 'single':
+            return numpy.complex64
+        else:
+            return numpy.complex128
+    else:
+        return numpy.int8
+
+
+def allocate_field_configs(nwalkers, nprop_tot, nfields, dtype, scratch=None):
+    """Allocate storage for all walkers' auxiliary field configurations.
+
+    Parameters
+    ----------
+    nwalkers : int
+        Number of walkers.
+    nprop_tot : int
+        Total number of propagators to store for back propagation + itcf.
+    nfields : int
+        Number of fields to store for each back propagation step.
+    dtype : type
+        Field configuration type.
+    scratch : string, optional
+        If present the configurations are stored in a memory mapped temporary
+        file in this directory, one per processor, which is removed once the
+        calculation finishes. Useful for long histories.
+
+    Returns
+    -------
+    configs : :class:`numpy.ndarray`
+        Field configurations. Shape (nwalkers, nprop_tot, nfields).
+    """
+    shape = (nwalkers, nprop_tot, nfields)
+    if scratch is None:
+        return numpy.zeros(shape=shape, dtype=dtype)
+    else:
+        f = tempfile.TemporaryFile(dir=scratch)
+        return numpy.memmap(f, dtype=dtype, mode='w+', shape=shape)
+
 
 class FieldConfig(object):
     """Object for managing stored auxilliary field.
@@ -196,11 +901,19 @@ class FieldConfig(object):
         Number of back propagation steps.
     dtype : type
         Field configuration type.
+    configs : :class:`numpy.ndarray`, optional
+        Preallocated storage for field configurations, see
+        :func:`allocate_field_configs`.
     """
-    def __init__(self, nfields, nprop_tot, nbp, dtype):
-        self.configs = numpy.zeros(shape=(nprop_tot, nfields), dtype=dtype)
+    def __init__(self, nfields, nprop_tot, nbp, dtype, configs=None):
+        if configs is None:
+            self.configs = numpy.zeros(shape=(nprop_tot, nfields), dtype=dtype)
+        else:
+            self.configs = configs
         self.cos_fac = numpy.zeros(shape=(nprop_tot, 1), dtype=float)
-        self.weight_fac = numpy.zeros(shape=(nprop_tot, 1), dtype=complex)
+        # Weight factors are only complex for continuous fields.
+        self.weight_fac = numpy.zeros(shape=(nprop_tot, 1),
+                                      dtype=numpy.result_type(dtype, float))
         self.step = 0
         # need to account for first iteration and how we iterate
         self.block = -1
@@ -227,6 +940,21 @@ class FieldConfig(object):
             if self.step % self.nbp == 0:
                 self.block = (self.block + 1) % self.nblock
 
+    def push_step(self, config):
+        """Add field configuration for a complete step to buffer.
+
+        Parameters
+        ----------
+        config : :class:`numpy.ndarray`
+            Auxilliary field configuration.
+        """
+        self.configs[self.step] = config
+        # Completed field configuration for this walker?
+        self.step = (self.step + 1) % self.nprop_tot
+        # Completed this block of back propagation steps?
+        if self.step % self.nbp == 0:
+            self.block = (self.block + 1) % self.nblock
+
     def push_full(self, config, cfac, wfac):
         """Add full field configuration for walker to buffer.
 
@@ -240,14 +968,9 @@ class FieldConfig(object):
             Weight factor to restore full walker weight following phaseless
             approximation.
         """
-        self.configs[self.step] = config
         self.cos_fac[self.step] = cfac
         self.weight_fac[self.step] = wfac
-        # Completed field configuration for this walker?
-        self.step = (self.step + 1) % self.nprop_tot
-        # Completed this block of back propagation steps?
-        if self.step % self.nbp == 0:
-            self.block = (self.block + 1) % self.nblock
+        self.push_step(config)
 
     def get_block(self):
         """Return a view to current block for back propagation."""
@@ -0,0 +1,567 @@
+import copy
+import numpy
+import scipy.linalg
+from pauxy.trial_wavefunction.free_electron import FreeElectron
+from pauxy.utils.linalg import adjugate, sherman_morrison
+from pauxy.walkers.buffer import WalkerBuffer
+
+
+class MultiDetTableWalker(object):
+    """Multi-determinant walker using excitations of a reference determinant.
+
+    Overlaps and Green's functions for all determinants in the trial
+    wavefunction expansion are computed from quantities involving only the
+    reference determinant :math:`|D_0\\rangle` and the trial wavefunction's
+    orbitals :math:`C`. Writing :math:`\\Theta = \\Phi(D_0^{\\dagger}\\Phi)^{-1}`
+    and :math:`T = C^{\\dagger}\\Theta`, a determinant with holes :math:`J` and
+    particles :math:`P` has overlap
+
+    .. math::
+        \\langle D|\\Phi\\rangle = \\langle D_0|\\Phi\\rangle
+            \\det(T_{PJ}),
+
+    and Green's function
+
+    .. math::
+        G^{T} = G_0^{T} - \\Theta_{:,J}T_{PJ}^{-1}
+            [C^{\\dagger}G_0^{T} - C^{\\dagger}]_{P,:}.
+
+    :math:`T_{PJ}` is singular whenever the walker has zero overlap with an
+    excited determinant, e.g., for a walker initialised to the reference, so
+    the Green's functions are only ever formed weighted by their overlap,
+    using :math:`\\det(T_{PJ})T_{PJ}^{-1} = \\mathrm{adj}(T_{PJ})`.
+
+    Memory per walker is thus independent of the number of determinants.
+    Assumes GHF style walkers and orbitals.
+
+    Parameters
+    ----------
+    weight : int
+        Walker weight.
+    system : object
+        System object.
+    trial : object
+        Trial wavefunction object.
+    index : int
+        Element of trial wavefunction to initalise walker to.
+    history : bool
+        If True store historic wavefunctions required for back propagation
+        and ITCFs. Default True.
+    """
+
+    def __init__(self, weight, system, trial, index=0, history=True):
+        self.weight = weight
+        self.alive = 1
+        self.nup = system.nup
+        self.nb = system.nbasis
+        if trial.initial_wavefunction == 'free_electron':
+            self.phi = numpy.zeros(shape=(2*system.nbasis,system.ne),
+                                   dtype=trial.psi.dtype)
+            tmp = FreeElectron(system, trial.psi.dtype==complex, {})
+            self.phi[:system.nbasis,:system.nup] = tmp.psi[:,:system.nup]
+            self.phi[system.nbasis:,system.nup:] = tmp.psi[:,system.nup:]
+        else:
+            self.phi = copy.deepcopy(trial.psi[0])
+        dtype = numpy.result_type(self.phi.dtype, trial.orbs.dtype)
+        norb = trial.orbs.shape[1]
+        self.inv_ovlp = numpy.zeros(shape=(system.ne, system.ne), dtype=dtype)
+        # Walker rotated by inverse overlap with reference determinant.
+        self.theta = numpy.zeros(shape=(2*system.nbasis, system.ne),
+                                 dtype=dtype)
+        # Overlaps of all trial orbitals with theta.
+        self.table = numpy.zeros(shape=(norb, system.ne), dtype=dtype)
+        # Transpose of Green's function of reference determinant.
+        self.gref_t = numpy.zeros(shape=(2*system.nbasis, 2*system.nbasis),
+                                  dtype=dtype)
+        # Trial orbitals contracted with gref_t.
+        self.table_g = numpy.zeros(shape=(norb, 2*system.nbasis), dtype=dtype)
+        # Green's function of each determinant on the current site. Stored as
+        # G[idet,spin,spin'] = <D_idet|c_{i,spin}^{dagger}c_{i,spin'}|phi>.
+        self.Gsite = numpy.zeros(shape=(trial.ndets, 2, 2), dtype=dtype)
+        # Determinant of Gsite[idet] / <D_idet|phi>, weighted by overlap.
+        self.Gsite_det = numpy.zeros(trial.ndets, dtype=dtype)
+        self.R = numpy.zeros(shape=(trial.ndets, 2), dtype=dtype)
+        self.ots = numpy.zeros(trial.ndets, dtype=dtype)
+        self.weights = numpy.zeros(trial.ndets, dtype=dtype)
+        self.G = numpy.zeros(shape=(2*system.nbasis, 2*system.nbasis),
+                             dtype=dtype)
+        # Cached local energy. G and the local energy are only recomputed if
+        # the walker is dirty, i.e., phi has changed.
+        self.dirty = True
+        self.energy = None
+        self.inverse_overlap(trial.psi)
+        self.ot = self.calc_otrial(trial)
+        self.greens_function(trial)
+        self.E_L = self.local_energy(system)[0].real
+        self.history = history
+        if history:
+            # Historic wavefunction for back propagation.
+            self.phi_old = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_init = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_bp = copy.deepcopy(self.phi)
+        else:
+            self.phi_old = None
+            self.phi_init = None
+            self.phi_bp = None
+        self.field_configs = None
+
+    def inverse_overlap(self, trial):
+        """Compute inverse overlap matrix with reference from scratch.
+
+        Parameters
+        ----------
+        trial : :class:`numpy.ndarray`
+            Trial wavefunction. Only the reference determinant is used.
+        """
+        self.inv_ovlp = scipy.linalg.inv(trial[0].conj().T.dot(self.phi))
+
+    def construct_tables(self, trial):
+        """Construct overlap tables from current inverse overlap matrix.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        """
+        self.theta = self.phi.dot(self.inv_ovlp)
+        self.table = trial.orbs.conj().T.dot(self.theta)
+        self.gref_t = self.theta.dot(trial.psi[0].conj().T)
+        self.table_g = trial.orbs.conj().T.dot(self.gref_t)
+
+    def calc_otrial(self, trial):
+        """Caculate overlap with trial wavefunction.
+
+        Also reconstructs the overlap tables.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+
+        Returns
+        -------
+        ot : float / complex
+            Overlap.
+        """
+        self.construct_tables(trial)
+        # Overlap with reference determinant.
+        self.ovlp0 = 1.0 / scipy.linalg.det(self.inv_ovlp)
+        self.ots[:] = self.ovlp0
+        for (idx, holes, particles) in trial.excitations:
+            tau = self.table[particles[:,:,None],holes[:,None,:]]
+            self.ots[idx] *= numpy.linalg.det(tau)
+        self.weights = trial.coeffs * self.ots
+        return sum(self.weights)
+
+    def calc_log_otrial(self, trial):
+        """Caculate log of overlap with trial wavefunction.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+
+        Returns
+        -------
+        log_ot : complex
+            Log of overlap.
+        """
+        return numpy.log(complex(self.calc_otrial(trial)))
+
+    @property
+    def log_ot(self):
+        """Log of overlap with trial wavefunction.
+
+        The overlap of a multi-determinant walker is a sum of determinants so
+        is stored directly in ot.
+        """
+        return numpy.log(complex(self.ot))
+
+    @log_ot.setter
+    def log_ot(self, value):
+        ot = numpy.exp(value)
+        self.ot = ot if numpy.iscomplexobj(self.phi) else ot.real
+
+    def update_overlap(self, probs, xi, coeffs):
+        """Update overlap.
+
+        The new overlaps with each determinant are stored in R, see
+        :func:`pauxy.propagation.hubbard.calculate_overlap_ratio_multi_det_table`.
+
+        Parameters
+        ----------
+        probs : :class:`numpy.ndarray`
+            Probabilities for chosing particular field configuration.
+        xi : int
+            Chosen field configuration.
+        coeffs : :class:`numpy.ndarray`
+            Trial wavefunction coefficients.
+        """
+        self.ots = self.R[:,xi].copy()
+        self.weights = coeffs * self.ots
+        self.ot = 2.0 * self.ot * probs[xi]
+
+    def reortho(self, trial):
+        """Reorthogonalise walker.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        """
+        nup = self.nup
+        # We assume that our walker is still block diagonal in the spin basis.
+        (self.phi[:self.nb,:nup], Rup) = (
+            scipy.linalg.qr(self.phi[:self.nb,:nup], mode='economic')
+        )
+        (self.phi[self.nb:,nup:], Rdown) = (
+            scipy.linalg.qr(self.phi[self.nb:,nup:], mode='economic')
+        )
+        # Enforce a positive diagonal for the overlap.
+        signs_up = numpy.diag(numpy.sign(numpy.diag(Rup)))
+        signs_down = numpy.diag(numpy.sign(numpy.diag(Rdown)))
+        self.phi[:self.nb,:nup] = self.phi[:self.nb,:nup].dot(signs_up)
+        self.phi[self.nb:,nup:] = self.phi[self.nb:,nup:].dot(signs_down)
+        drup = scipy.linalg.det(signs_up.dot(Rup))
+        drdn = scipy.linalg.det(signs_down.dot(Rdown))
+        detR = drup * drdn
+        self.inverse_overlap(trial.psi)
+        self.ot = self.calc_otrial(trial)
+        return detR
+
+    def green_correction(self, trial, idx, holes, particles, rows, cols):
+        """Correction to the reference Green's function for excited determinants.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        idx : :class:`numpy.ndarray`
+            Indices of determinants.
+        holes : :class:`numpy.ndarray`
+            Holes in reference of each determinant.
+        particles : :class:`numpy.ndarray`
+            Particles of each determinant.
+        rows : :class:`numpy.ndarray`
+            Row indices of transposed Green's function required.
+        cols : :class:`numpy.ndarray`
+            Column indices of transposed Green's function required.
+
+        Returns
+        -------
+        (tau, theta, W) : tuple
+            Factors of correction to transposed Green's function. The
+            overlap weighted correction for determinant d is given by
+            ovlp0*theta[d].dot(adj(tau[d])).dot(W[d]) of shape
+            (len(rows), len(cols)).
+        """
+        tau = self.table[particles[:,:,None],holes[:,None,:]]
+        W = (self.table_g[:,cols][particles] -
+             trial.orbs[cols].conj().T[particles])
+        theta = self.theta[rows][:,holes].transpose(1,0,2)
+        return (tau, theta, W)
+
+    def bordered_det(self, tau, theta, W, g):
+        r"""Overlap weighted determinant of blocks of excited Green's functions.
+
+        Uses
+
+        .. math::
+            \det(T_{PJ})\det(G^T_{SS}) = \det\begin{pmatrix}
+                T_{PJ} & W_{:,S} \\
+                \Theta_{S,J} & G^T_{0,SS} \end{pmatrix},
+
+        which avoids inverting :math:`T_{PJ}`.
+
+        Parameters
+        ----------
+        tau : :class:`numpy.ndarray`
+            Excitation blocks of overlap table.
+        theta : :class:`numpy.ndarray`
+            Rows S of theta for each determinant's holes.
+        W : :class:`numpy.ndarray`
+            Columns S of W for each determinant's particles.
+        g : :class:`numpy.ndarray`
+            Block SS of transposed reference Green's function.
+
+        Returns
+        -------
+        det : :class:`numpy.ndarray`
+            ovlp0 * det(tau) * det(G^T_SS) for each determinant.
+        """
+        k = tau.shape[-1]
+        n = g.shape[-1]
+        shape = numpy.broadcast(tau[...,0,0], W[...,0,0], theta[...,0,0],
+                                g[...,0,0]).shape
+        M = numpy.zeros(shape=shape+(k+n,k+n),
+                        dtype=numpy.result_type(tau, W, theta, g))
+        M[...,:k,:k] = tau
+        M[...,:k,k:] = W
+        M[...,k:,:k] = theta
+        M[...,k:,k:] = g
+        return self.ovlp0 * numpy.linalg.det(M)
+
+    def site_greens_function(self, trial, i):
+        """Compute overlap weighted Green's function of each determinant on site i.
+
+        Also computes the overlap weighted determinant of each determinant's
+        2x2 Green's function on site i.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        i : int
+            Basis index.
+        """
+        sites = numpy.array([i, i+self.nb])
+        g = self.gref_t[sites][:,sites]
+        self.Gsite[:] = self.ots[:,None,None] * g.T
+        self.Gsite_det[:] = self.ots * numpy.linalg.det(g)
+        for (idx, holes, particles) in trial.excitations:
+            (tau, theta, W) = self.green_correction(trial, idx, holes,
+                                                    particles, sites, sites)
+            Z = numpy.matmul(adjugate(tau), W)
+            dets = numpy.linalg.det(tau)
+            Gt = self.ovlp0 * (dets[:,None,None]*g - numpy.matmul(theta, Z))
+            self.Gsite[idx] = Gt.transpose(0,2,1)
+            self.Gsite_det[idx] = self.bordered_det(tau, theta, W, g)
+
+    def greens_function(self, trial):
+        """Compute walker's (mixed) green's function.
+
+        Also computes the diagonal blocks of each determinant's Green's
+        function required for the potential energy.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        """
+        nb = self.nb
+        Gt = numpy.sum(self.weights) * self.gref_t
+        diag = numpy.diagonal(self.gref_t)
+        offdiag = numpy.diagonal(self.gref_t[:nb,nb:])
+        self.gdiag = numpy.outer(self.weights, diag[:nb]*diag[nb:]-
+                                 offdiag*numpy.diagonal(self.gref_t[nb:,:nb]))
+        rows = numpy.arange(2*nb)
+        # Spin up and down index of each site.
+        sites = numpy.array([rows[:nb], rows[nb:]]).T
+        gsites = self.gref_t[sites[:,:,None],sites[:,None,:]]
+        for (idx, holes, particles) in trial.excitations:
+            (tau, theta, W) = self.green_correction(trial, idx, holes,
+                                                    particles, rows, rows)
+            Z = numpy.matmul(adjugate(tau), W)
+            coeffs = self.ovlp0 * trial.coeffs[idx]
+            Gt -= numpy.einsum('d,dpk,dkq->pq', coeffs, theta, Z)
+            dets = self.bordered_det(tau[:,None], theta[:,sites],
+                                     W[:,:,sites].transpose(0,2,1,3),
+                                     gsites)
+            self.gdiag[idx] = trial.coeffs[idx,None] * dets
+        self.G = Gt.T / numpy.sum(self.weights)
+        self.dirty = False
+        self.energy = None
+
+    def invalidate(self):
+        """Flag cached Green's function and local energy as out of date.
+
+        Should be called whenever phi is modified.
+        """
+        self.dirty = True
+        self.energy = None
+
+    def update_inverse_overlap(self, trial, vtup, vtdown, i):
+        r"""Update inverse overlap matrix given a single row update of walker.
+
+        The tables are updated alongside the inverse overlap matrix with the
+        reference determinant using rank-1 updates. If
+        :math:`\Phi\rightarrow\Phi + e_r x^T`, then
+
+        .. math::
+            \Theta^{\prime} = \Theta + \frac{(e_r - g) \otimes x^T
+                (D_0^{\dagger}\Phi)^{-1}}{1+h_r}
+
+            G_0^{T\prime} = G_0^{T} + \frac{(e_r - g) \otimes h}{1+h_r},
+
+        where :math:`h = x^T (D_0^{\dagger}\Phi)^{-1}D_0^{\dagger}` and
+        :math:`g = G^T_{0,:,r}`.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        vtup : :class:`numpy.ndarray`
+            Update vector for spin up sector.
+        vtdown : :class:`numpy.ndarray`
+            Update vector for spin down sector.
+        i : int
+            Basis index.
+        """
+        nup = self.nup
+        ne = self.phi.shape[1]
+        ref = trial.psi[0]
+        for (r, vt) in [(i, vtup), (i+self.nb, vtdown)]:
+            x = numpy.zeros(ne, dtype=self.phi.dtype)
+            if r == i:
+                x[:nup] = vt
+            else:
+                x[nup:] = vt
+            xA = x.dot(self.inv_ovlp)
+            h = ref.conj().dot(xA)
+            denom = 1.0 + h[r]
+            g = -self.gref_t[:,r]
+            g[r] += 1.0
+            cg = trial.orbs.conj().T.dot(g)
+            self.theta += numpy.outer(g, xA/denom)
+            self.table += numpy.outer(cg, xA/denom)
+            self.gref_t += numpy.outer(g, h/denom)
+            self.table_g += numpy.outer(cg, h/denom)
+            self.inv_ovlp = sherman_morrison(self.inv_ovlp, ref[r].conj(), x)
+            self.ovlp0 *= denom
+
+    def local_energy(self, system):
+        """Compute walkers local energy
+
+        Assumes the Hubbard model.
+        The result is cached until the Green's function is next recomputed.
+
+        Parameters
+        ----------
+        system : object
+            System object.
+
+        Returns
+        -------
+        (E, T, V) : tuple
+            Mixed estimates for walker's energy components.
+        """
+        if self.energy is None:
+            ke = numpy.sum(system.Text*self.G)
+            pe = system.U * numpy.sum(self.gdiag) / numpy.sum(self.weights)
+            self.energy = (ke+pe, ke, pe)
+        return self.energy
+
+    def history_arrays(self):
+        """Historic wavefunctions and auxiliary field configurations.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Historic walker data. Empty if not stored.
+        """
+        if not self.history:
+            return []
+        fc = self.field_configs
+        return [self.phi_old, self.phi_init, self.phi_bp, fc.configs,
+                fc.cos_fac, fc.weight_fac]
+
+    def get_buffer(self):
+        """Get walker buffer for MPI communication
+
+        Returns
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        buff = {
+            'phi': self.phi,
+            'weight': self.weight,
+            'inv_ovlp': self.inv_ovlp,
+            'ovlp0': self.ovlp0,
+            'theta': self.theta,
+            'table': self.table,
+            'gref_t': self.gref_t,
+            'table_g': self.table_g,
+            'G': self.G,
+            'overlap': self.ot,
+            'overlaps': self.ots,
+            'E_L': self.E_L,
+            'history': self.history_arrays()
+        }
+        return buff
+
+    def set_buffer(self, buff):
+        """Set walker buffer following MPI communication
+
+        Parameters
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        numpy.copyto(self.phi, buff['phi'])
+        numpy.copyto(self.inv_ovlp, buff['inv_ovlp'])
+        self.ovlp0 = buff['ovlp0']
+        numpy.copyto(self.theta, buff['theta'])
+        numpy.copyto(self.table, buff['table'])
+        numpy.copyto(self.gref_t, buff['gref_t'])
+        numpy.copyto(self.table_g, buff['table_g'])
+        numpy.copyto(self.G, buff['G'])
+        self.weight = buff['weight']
+        self.ot = buff['overlap']
+        self.E_L = buff['E_L']
+        numpy.copyto(self.ots, buff['overlaps'])
+        for (a, b) in zip(self.history_arrays(), buff['history']):
+            numpy.copyto(a, b)
+        self.invalidate()
+
+    def buffer_arrays(self):
+        """Walker data communicated during population control.
+
+        Only data which can't be cheaply recomputed is included.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Walker data.
+        """
+        return [self.phi, self.ots] + self.history_arrays()
+
+    def buffer_layout(self):
+        """Construct layout of contiguous buffer for MPI communication.
+
+        Returns
+        -------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        """
+        return WalkerBuffer(self.buffer_arrays(), nscalars=3)
+
+    def pack(self, layout, buff):
+        """Pack walker into contiguous buffer for MPI communication.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        """
+        layout.pack(buff, self.buffer_arrays(),
+                    (self.weight, self.ot, self.E_L))
+
+    def unpack(self, layout, buff, trial):
+        """Unpack walker from contiguous buffer following MPI communication.
+
+        The inverse overlap matrix, overlap tables and Green's function are
+        rebuilt.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to unpack.
+        trial : object
+            Trial wavefunction object.
+        """
+        (weight, ot, E_L) = layout.unpack(buff, self.buffer_arrays())
+        if not numpy.iscomplexobj(self.phi):
+            (weight, ot) = (weight.real, ot.real)
+        self.weight = weight
+        self.ot = ot
+        self.E_L = E_L.real
+        self.inverse_overlap(trial.psi)
+        self.calc_otrial(trial)
+        self.greens_function(trial)
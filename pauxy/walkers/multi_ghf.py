@@ -1,8 +1,11 @@
 import copy
 import numpy
+import scipy.linalg
 from pauxy.estimators.mixed import local_energy_ghf
 from pauxy.trial_wavefunction.free_electron import FreeElectron
 from pauxy.utils.io import read_fortran_complex_numbers
+from pauxy.utils.linalg import sherman_morrison_batch
+from pauxy.walkers.buffer import WalkerBuffer
 
 class MultiGHFWalker(object):
     """Multi-GHF style walker.
@@ -21,11 +24,14 @@ class MultiGHFWalker(object):
         Initialise weights to zeros or ones.
     wfn0 : string
         Initial wavefunction.
+    history : bool
+        If True store historic wavefunctions required for back propagation
+        and ITCFs. Default True.
     """
 
     def __init__(self, weight, system, trial, index=0,
-                 weights='zeros', wfn0='init'):
-        self.weight = nw
+                 weights='zeros', wfn0='init', history=True):
+        self.weight = weight
         self.alive = 1
         # Initialise to a particular free electron slater determinant rather
         # than GHF. Can actually initialise to GHF by passing single GHF with
@@ -66,20 +72,30 @@ class MultiGHFWalker(object):
         self.G = numpy.zeros(shape=(2*system.nbasis, 2*system.nbasis),
                              dtype=self.phi.dtype)
         self.ots = numpy.zeros(trial.ndets, dtype=self.phi.dtype)
+        # Cached local energy. G and the local energy are only recomputed if
+        # the walker is dirty, i.e., phi has changed.
+        self.dirty = True
+        self.energy = None
         # Contains overlaps of the current walker with the trial wavefunction.
         if wfn0 != 'GHF':
             self.ot = self.calc_otrial(trial)
             self.greens_function(trial)
-            self.E_L = pauxy.estimators.local_energy_ghf(system, self.Gi,
-                                                         self.weights,
-                                                         sum(self.weights))[0].real
+            self.E_L = local_energy_ghf(system, self.Gi, self.weights,
+                                        sum(self.weights))[0].real
         self.nb = system.nbasis
-        # Historic wavefunction for back propagation.
-        self.phi_old = copy.deepcopy(self.phi)
-        # Historic wavefunction for ITCF.
-        self.phi_init = copy.deepcopy(self.phi)
-        # Historic wavefunction for ITCF.
-        self.phi_bp = copy.deepcopy(trial.psi)
+        self.history = history
+        if history:
+            # Historic wavefunction for back propagation.
+            self.phi_old = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_init = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_bp = copy.deepcopy(trial.psi)
+        else:
+            self.phi_old = None
+            self.phi_init = None
+            self.phi_bp = None
+        self.field_configs = None
 
     def inverse_overlap(self, trial):
         """Compute inverse overlap matrix from scratch.
@@ -89,11 +105,8 @@ class MultiGHFWalker(object):
         trial : :class:`numpy.ndarray`
             Trial wavefunction.
         """
-        nup = self.nup
-        for (indx, t) in enumerate(trial):
-            self.inv_ovlp[indx,:,:] = (
-                scipy.linalg.inv((t.conj()).T.dot(self.phi))
-            )
+        ovlp = numpy.einsum('dpi,pj->dij', trial.conj(), self.phi)
+        self.inv_ovlp[:] = numpy.linalg.inv(ovlp)
 
     def calc_otrial(self, trial):
         """Caculate overlap with trial wavefunction.
@@ -115,6 +128,35 @@ class MultiGHFWalker(object):
             self.weights[ix] = trial.coeffs[ix] * self.ots[ix]
         return sum(self.weights)
 
+    def calc_log_otrial(self, trial):
+        """Caculate log of overlap with trial wavefunction.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+
+        Returns
+        -------
+        log_ot : complex
+            Log of overlap.
+        """
+        return numpy.log(complex(self.calc_otrial(trial)))
+
+    @property
+    def log_ot(self):
+        """Log of overlap with trial wavefunction.
+
+        The overlap of a multi-determinant walker is a sum of determinants so
+        is stored directly in ot.
+        """
+        return numpy.log(complex(self.ot))
+
+    @log_ot.setter
+    def log_ot(self, value):
+        ot = numpy.exp(value)
+        self.ot = ot if numpy.iscomplexobj(self.phi) else ot.real
+
     def update_overlap(self, probs, xi, coeffs):
         """Update overlap.
 
@@ -181,9 +223,32 @@ class MultiGHFWalker(object):
             )
         denom = sum(self.weights)
         self.G = numpy.einsum('i,ijk->jk', self.weights, self.Gi) / denom
+        self.dirty = False
+        self.energy = None
+
+    def invalidate(self):
+        """Flag cached Green's function and local energy as out of date.
+
+        Should be called whenever phi is modified.
+        """
+        self.dirty = True
+        self.energy = None
 
     def update_inverse_overlap(self, trial, vtup, vtdown, i):
-        """Update inverse overlap matrix given a single row update of walker.
+        r"""Update inverse overlap matrix given a single row update of walker.
+
+        The spin up and spin down rows of the walker are updated separately
+        and each amounts to a rank-1 update of the overlap matrices with every
+        determinant of the trial wavefunction. Both the inverse overlap
+        matrices and the Green's functions :math:`G^i` are updated using
+        Sherman-Morrison for all determinants simultaneously. If
+        :math:`\Phi\rightarrow\Phi + e_r x^T`, then
+
+        .. math::
+            G^{i\prime} = G^i + \frac{h \otimes (e_r - g)}{1+h_r},
+
+        where :math:`h = x^T (\Psi_i^{\dagger}\Phi)^{-1}\Psi_i^{\dagger}` and
+        :math:`g = G^i_{r,:}`.
 
         Parameters
         ----------
@@ -197,14 +262,27 @@ class MultiGHFWalker(object):
             Basis index.
         """
         nup = self.nup
-        for (indx, t) in enumerate(trial.psi):
-            self.inv_ovlp[indx,:,:] = (
-                scipy.linalg.inv((t.conj()).T.dot(self.phi))
-            )
+        ne = self.phi.shape[1]
+        for (r, vt) in [(i, vtup), (i+self.nb, vtdown)]:
+            x = numpy.zeros(ne, dtype=self.phi.dtype)
+            if r == i:
+                x[:nup] = vt
+            else:
+                x[nup:] = vt
+            u = trial.psi[:,r,:].conj()
+            h = numpy.einsum('dk,dpk->dp', x.dot(self.inv_ovlp),
+                             trial.psi.conj())
+            denom = 1.0 + h[:,r]
+            g = -self.Gi[:,r,:]
+            g[:,r] += 1.0
+            self.Gi += numpy.einsum('dp,dq->dpq', h/denom[:,None], g)
+            sherman_morrison_batch(self.inv_ovlp, u, x)
 
     def local_energy(self, system):
         """Compute walkers local energy
 
+        The result is cached until the Green's function is next recomputed.
+
         Parameters
         ----------
         system : object
@@ -215,5 +293,124 @@ class MultiGHFWalker(object):
         (E, T, V) : tuple
             Mixed estimates for walker's energy components.
         """
-        return pauxy.estimators.local_energy_ghf(system, self.Gi,
-                                                   self.weights, self.ot)
+        if self.energy is None:
+            self.energy = local_energy_ghf(system, self.Gi, self.weights,
+                                           self.ot)
+        return self.energy
+
+    def history_arrays(self):
+        """Historic wavefunctions and auxiliary field configurations.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Historic walker data. Empty if not stored.
+        """
+        if not self.history:
+            return []
+        fc = self.field_configs
+        return [self.phi_old, self.phi_init, self.phi_bp, fc.configs,
+                fc.cos_fac, fc.weight_fac]
+
+    def get_buffer(self):
+        """Get walker buffer for MPI communication
+
+        Returns
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        buff = {
+            'phi': self.phi,
+            'weight': self.weight,
+            'inv_ovlp': self.inv_ovlp,
+            'Gi': self.Gi,
+            'G': self.G,
+            'overlap': self.ot,
+            'overlaps': self.ots,
+            'weights': self.weights,
+            'E_L': self.E_L,
+            'history': self.history_arrays()
+        }
+        return buff
+
+    def set_buffer(self, buff):
+        """Set walker buffer following MPI communication
+
+        Parameters
+        -------
+        buff : dict
+            Relevant walker information for population control.
+        """
+        numpy.copyto(self.phi, buff['phi'])
+        numpy.copyto(self.inv_ovlp, buff['inv_ovlp'])
+        numpy.copyto(self.Gi, buff['Gi'])
+        numpy.copyto(self.G, buff['G'])
+        self.weight = buff['weight']
+        self.ot = buff['overlap']
+        self.E_L = buff['E_L']
+        numpy.copyto(self.ots, buff['overlaps'])
+        numpy.copyto(self.weights, buff['weights'])
+        for (a, b) in zip(self.history_arrays(), buff['history']):
+            numpy.copyto(a, b)
+        self.invalidate()
+
+    def buffer_arrays(self):
+        """Walker data communicated during population control.
+
+        Only data which can't be cheaply recomputed is included.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Walker data.
+        """
+        return [self.phi] + self.history_arrays()
+
+    def buffer_layout(self):
+        """Construct layout of contiguous buffer for MPI communication.
+
+        Returns
+        -------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        """
+        return WalkerBuffer(self.buffer_arrays(), nscalars=3)
+
+    def pack(self, layout, buff):
+        """Pack walker into contiguous buffer for MPI communication.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        """
+        layout.pack(buff, self.buffer_arrays(),
+                    (self.weight, self.ot, self.E_L))
+
+    def unpack(self, layout, buff, trial):
+        """Unpack walker from contiguous buffer following MPI communication.
+
+        The inverse overlap matrices, overlaps with each determinant and
+        Green's functions are rebuilt.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to unpack.
+        trial : object
+            Trial wavefunction object.
+        """
+        (weight, ot, E_L) = layout.unpack(buff, self.buffer_arrays())
+        if not numpy.iscomplexobj(self.phi):
+            (weight, ot) = (weight.real, ot.real)
+        self.weight = weight
+        self.ot = ot
+        self.E_L = E_L.real
+        self.inverse_overlap(trial.psi)
+        self.calc_otrial(trial)
+        self.greens_function(trial)
@@ -0,0 +1,155 @@
+import copy
+import numpy
+import scipy.linalg
+from numpy.lib.stride_tricks import as_strided
+from pauxy.utils.linalg import inverse_log_det
+from pauxy.walkers.single_det import SingleDetWalker
+
+
+class RHFWalker(SingleDetWalker):
+    """Spin restricted walker for closed shell systems.
+
+    For a spin independent Hamiltonian and Hubbard-Stratonovich transformation
+    and a closed shell (RHF) trial wavefunction both spin sectors of the walker
+    remain identical during propagation. Only the spin up orbitals are stored
+    and propagated, the overlap with the trial wavefunction is the square of
+    the overlap of a single spin sector and the Green's function is the same
+    for both spins.
+
+    Parameters
+    ----------
+    weight : int
+        Walker weight.
+    system : object
+        System object.
+    trial : object
+        Trial wavefunction object.
+    index : int
+        Element of trial wavefunction to initalise walker to. For interface
+        consistency.
+    history : bool
+        If True store historic wavefunctions required for back propagation
+        and ITCFs. Default True.
+    """
+
+    def __init__(self, weight, system, trial, index=0, history=True):
+        self.weight = weight
+        self.alive = 1
+        self.nup = system.nup
+        self.phi = numpy.copy(trial.psi[:,:system.nup])
+        self.inv_ovlp = [0, 0]
+        # Cached local energy. G and the local energy are only recomputed if
+        # the walker is dirty, i.e., phi has changed.
+        self.dirty = True
+        self.energy = None
+        self.inverse_overlap(trial.psi)
+        # Green's function of a single spin sector, see G.
+        self.Gs = numpy.zeros(shape=(system.nbasis, system.nbasis),
+                              dtype=trial.psi.dtype)
+        # Only required by the generic propagator, allocated when needed.
+        self.Gmod = None
+        self.greens_function(trial)
+        # Overlap with trial wavefunction is stored as a (complex) log to
+        # avoid overflow, see ot.
+        self.log_ot = 0.0j
+        # interface consistency
+        self.ots = numpy.zeros(1)
+        self.E_L = self.local_energy(system)[0].real
+        # walkers overlap at time tau before backpropagation occurs
+        self.ot_bp = 1.0
+        # walkers weight at time tau before backpropagation occurs
+        self.weight_bp = weight
+        self.history = history
+        if history:
+            # Historic wavefunction for back propagation.
+            self.phi_old = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_init = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_bp = copy.deepcopy(self.phi)
+        else:
+            self.phi_old = None
+            self.phi_init = None
+            self.phi_bp = None
+        self.field_configs = None
+        self.weights = numpy.array([1])
+
+    @property
+    def G(self):
+        """Walker's Green's function of shape (2, nbasis, nbasis).
+
+        Both spin sectors are views of the single spin Green's function Gs.
+        """
+        return as_strided(self.Gs, shape=(2,)+self.Gs.shape,
+                          strides=(0,)+self.Gs.strides)
+
+    def inverse_overlap(self, trial):
+        """Compute inverse overlap matrix from scratch.
+
+        The inverse overlap matrix is shared by both spin sectors.
+
+        Parameters
+        ----------
+        trial : :class:`numpy.ndarray`
+            Trial wavefunction.
+        """
+        nup = self.nup
+        (inv_ovlp, log_ovlp) = (
+            inverse_log_det((trial[:,:nup].conj()).T.dot(self.phi))
+        )
+        self.inv_ovlp[0] = inv_ovlp
+        self.inv_ovlp[1] = inv_ovlp
+        self.log_ovlp = 2 * log_ovlp
+
+    def reortho(self, trial):
+        """reorthogonalise walker.
+
+        parameters
+        ----------
+        trial : object
+            trial wavefunction object. for interface consistency.
+
+        Returns
+        -------
+        detR : float
+            Determinant of the R factor of both spin sectors.
+        """
+        (Q, R) = scipy.linalg.qr(self.phi, mode='economic')
+        # Factor phases of diagonal of R into Q.
+        phases = numpy.diag(R) / numpy.abs(numpy.diag(R))
+        self.phi[:] = Q * phases
+        R = phases.conj()[:,None] * R
+        # (T^{dagger}QR)^{-1} -> R(T^{dagger}QR)^{-1}
+        inv_ovlp = R.dot(self.inv_ovlp[0])
+        self.inv_ovlp[0] = inv_ovlp
+        self.inv_ovlp[1] = inv_ovlp
+        log_detR = 2 * numpy.sum(numpy.log(numpy.abs(numpy.diag(R))))
+        self.log_ot -= log_detR
+        self.log_ovlp -= log_detR
+        return numpy.exp(log_detR)
+
+    def greens_function(self, trial):
+        """Compute walker's green's function.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+        """
+        nup = self.nup
+        self.Gs[:] = (
+            (self.phi.dot(self.inv_ovlp[0]).dot(trial.psi[:,:nup].conj().T)).T
+        )
+        self.dirty = False
+        self.energy = None
+
+    def rotated_greens_function(self):
+        """Compute "rotated" walker's green's function.
+
+        Green's function without trial wavefunction multiplication. Only a
+        single spin sector is stored, i.e., Gmod has shape (1, nbasis, nup).
+        """
+        if self.Gmod is None:
+            self.Gmod = numpy.zeros(shape=(1, self.phi.shape[0], self.nup),
+                                    dtype=self.phi.dtype)
+        self.Gmod[0] = self.phi.dot(self.inv_ovlp[0])
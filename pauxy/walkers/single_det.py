@@ -3,7 +3,8 @@ import numpy
 import scipy.linalg
 from pauxy.estimators.mixed import local_energy
 from pauxy.trial_wavefunction.free_electron import FreeElectron
-from pauxy.utils.linalg import sherman_morrison
+from pauxy.utils.linalg import sherman_morrison, inverse_log_det
+from pauxy.walkers.buffer import WalkerBuffer
 
 class SingleDetWalker(object):
     """UHF style walker.
@@ -18,9 +19,12 @@ class SingleDetWalker(object):
         Trial wavefunction object.
     index : int
         Element of trial wavefunction to initalise walker to.
+    history : bool
+        If True store historic wavefunctions required for back propagation
+        and ITCFs. Default True.
     """
 
-    def __init__(self, weight, system, trial, index=0):
+    def __init__(self, weight, system, trial, index=0, history=True):
         self.weight = weight
         self.alive = 1
         if trial.initial_wavefunction == 'free_electron':
@@ -33,47 +37,94 @@ class SingleDetWalker(object):
             self.phi = copy.deepcopy(trial.psi)
         self.inv_ovlp = [0, 0]
         self.nup = system.nup
+        # Cached local energy. G and the local energy are only recomputed if
+        # the walker is dirty, i.e., phi has changed.
+        self.dirty = True
+        self.energy = None
         self.inverse_overlap(trial.psi)
         self.G = numpy.zeros(shape=(2, system.nbasis, system.nbasis),
                              dtype=trial.psi.dtype)
-        self.Gmod = numpy.zeros(shape=(2, system.nbasis, system.nup),
-                                dtype=trial.psi.dtype)
+        # Only required by the generic propagator, allocated when needed.
+        self.Gmod = None
         self.greens_function(trial)
-        self.ot = 1.0
+        # Overlap with trial wavefunction is stored as a (complex) log to
+        # avoid overflow, see ot.
+        self.log_ot = 0.0j
         # interface consistency
         self.ots = numpy.zeros(1)
-        self.E_L = local_energy(system, self.G)[0].real
+        self.E_L = self.local_energy(system)[0].real
         # walkers overlap at time tau before backpropagation occurs
         self.ot_bp = 1.0
         # walkers weight at time tau before backpropagation occurs
         self.weight_bp = weight
-        # Historic wavefunction for back propagation.
-        self.phi_old = copy.deepcopy(self.phi)
-        # Historic wavefunction for ITCF.
-        self.phi_init = copy.deepcopy(self.phi)
-        # Historic wavefunction for ITCF.
-        self.phi_bp = copy.deepcopy(self.phi)
+        self.history = history
+        if history:
+            # Historic wavefunction for back propagation.
+            self.phi_old = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_init = copy.deepcopy(self.phi)
+            # Historic wavefunction for ITCF.
+            self.phi_bp = copy.deepcopy(self.phi)
+        else:
+            self.phi_old = None
+            self.phi_init = None
+            self.phi_bp = None
+        self.field_configs = None
         self.weights = numpy.array([1])
 
+    @property
+    def ot(self):
+        """Overlap with trial wavefunction, exponential of log_ot."""
+        return self.exp_overlap(self.log_ot)
+
+    @ot.setter
+    def ot(self, value):
+        self.log_ot = numpy.log(complex(value))
+
+    def exp_overlap(self, log_ovlp):
+        """Convert log overlap(s) to overlap(s) of the walker's type.
+
+        Parameters
+        ----------
+        log_ovlp : complex or :class:`numpy.ndarray`
+            Log of overlap(s).
+
+        Returns
+        -------
+        ovlp : float / complex or :class:`numpy.ndarray`
+            Overlap(s). Real if the walker is real.
+        """
+        ovlp = numpy.exp(log_ovlp)
+        if numpy.iscomplexobj(self.phi):
+            return ovlp
+        else:
+            return ovlp.real
+
     def inverse_overlap(self, trial):
         """Compute inverse overlap matrix from scratch.
 
+        The log of the overlap with the trial wavefunction is found from the
+        same LU factorisation, see :meth:`calc_log_otrial`.
+
         Parameters
         ----------
         trial : :class:`numpy.ndarray`
             Trial wavefunction.
         """
         nup = self.nup
-        self.inv_ovlp[0] = (
-            scipy.linalg.inv((trial[:,:nup].conj()).T.dot(self.phi[:,:nup]))
+        (self.inv_ovlp[0], log_up) = (
+            inverse_log_det((trial[:,:nup].conj()).T.dot(self.phi[:,:nup]))
         )
-        self.inv_ovlp[1] = (
-            scipy.linalg.inv((trial[:,nup:].conj()).T.dot(self.phi[:,nup:]))
+        (self.inv_ovlp[1], log_down) = (
+            inverse_log_det((trial[:,nup:].conj()).T.dot(self.phi[:,nup:]))
         )
+        self.log_ovlp = log_up + log_down
 
     def update_inverse_overlap(self, trial, vtup, vtdown, i):
         """Update inverse overlap matrix given a single row update of walker.
 
+        The log overlap is updated using the matrix determinant lemma.
+
         Parameters
         ----------
         trial : object
@@ -86,6 +137,13 @@ class SingleDetWalker(object):
             Basis index.
         """
         nup = self.nup
+        ratio_up = (
+            1.0 + vtup.dot(self.inv_ovlp[0]).dot(trial.psi[i,:nup].conj())
+        )
+        ratio_down = (
+            1.0 + vtdown.dot(self.inv_ovlp[1]).dot(trial.psi[i,nup:].conj())
+        )
+        self.log_ovlp += numpy.log(complex(ratio_up*ratio_down))
         self.inv_ovlp[0] = (
             sherman_morrison(self.inv_ovlp[0], trial.psi[i,:nup].conj(), vtup)
         )
@@ -106,9 +164,24 @@ class SingleDetWalker(object):
         ot : float / complex
             Overlap.
         """
-        dup = scipy.linalg.det(self.inv_ovlp[0])
-        ddn = scipy.linalg.det(self.inv_ovlp[1])
-        return 1.0 / (dup*ddn)
+        return self.exp_overlap(self.calc_log_otrial(trial))
+
+    def calc_log_otrial(self, trial):
+        """Caculate log of overlap with trial wavefunction.
+
+        Available after :meth:`inverse_overlap` without further work.
+
+        Parameters
+        ----------
+        trial : object
+            Trial wavefunction object.
+
+        Returns
+        -------
+        log_ot : complex
+            Log of overlap.
+        """
+        return self.log_ovlp
 
     def update_overlap(self, probs, xi, coeffs):
         """Update overlap.
@@ -122,7 +195,7 @@ class SingleDetWalker(object):
         coeffs : :class:`numpy.ndarray`
             Trial wavefunction coefficients. For interface consistency.
         """
-        self.ot = 2 * self.ot * probs[xi]
+        self.log_ot += numpy.log(complex(2*probs[xi]))
 
     def reortho(self, trial):
         """reorthogonalise walker.
@@ -137,15 +210,20 @@ class SingleDetWalker(object):
                                                   mode='economic')
         (self.phi[:,nup:], Rdown) = scipy.linalg.qr(self.phi[:,nup:],
                                                     mode='economic')
-        signs_up = numpy.diag(numpy.sign(numpy.diag(Rup)))
-        signs_down = numpy.diag(numpy.sign(numpy.diag(Rdown)))
-        self.phi[:,:nup] = self.phi[:,:nup].dot(signs_up)
-        self.phi[:,nup:] = self.phi[:,nup:].dot(signs_down)
-        drup = scipy.linalg.det(signs_up.dot(Rup))
-        drdn = scipy.linalg.det(signs_down.dot(Rdown))
-        detR = drup * drdn
-        self.ot = self.ot / detR
-        return detR
+        # Factor phases of diagonal of R into Q by broadcasting. R is upper
+        # triangular so log det(R) is the sum of the log of its diagonal.
+        log_detR = 0.0
+        for (s, R) in enumerate([Rup, Rdown]):
+            cols = slice(0, nup) if s == 0 else slice(nup, None)
+            phases = numpy.diag(R) / numpy.abs(numpy.diag(R))
+            self.phi[:,cols] = self.phi[:,cols] * phases
+            R = phases.conj()[:,None] * R
+            # (T^{dagger}QR)^{-1} -> R(T^{dagger}QR)^{-1}
+            self.inv_ovlp[s] = R.dot(self.inv_ovlp[s])
+            log_detR += numpy.sum(numpy.log(numpy.abs(numpy.diag(R))))
+        self.log_ot -= log_detR
+        self.log_ovlp -= log_detR
+        return numpy.exp(log_detR)
 
     def greens_function(self, trial):
         """Compute walker's green's function.
@@ -163,6 +241,16 @@ class SingleDetWalker(object):
         self.G[1] = (
             (self.phi[:,nup:].dot(self.inv_ovlp[1]).dot(t[:,nup:].conj().T)).T
         )
+        self.dirty = False
+        self.energy = None
+
+    def invalidate(self):
+        """Flag cached Green's function and local energy as out of date.
+
+        Should be called whenever phi is modified.
+        """
+        self.dirty = True
+        self.energy = None
 
     def rotated_greens_function(self):
         """Compute "rotated" walker's green's function.
@@ -175,12 +263,17 @@ class SingleDetWalker(object):
             Trial wavefunction object.
         """
         nup = self.nup
+        if self.Gmod is None:
+            self.Gmod = numpy.zeros(shape=(2, self.phi.shape[0], nup),
+                                    dtype=self.phi.dtype)
         self.Gmod[0] = self.phi[:,:nup].dot(self.inv_ovlp[0])
         self.Gmod[1] = self.phi[:,nup:].dot(self.inv_ovlp[1])
 
     def local_energy(self, system):
         """Compute walkers local energy
 
+        The result is cached until the Green's function is next recomputed.
+
         Parameters
         ----------
         system : object
@@ -191,7 +284,23 @@ class SingleDetWalker(object):
         (E, T, V) : tuple
             Mixed estimates for walker's energy components.
         """
-        return local_energy(system, self.G)
+        if self.energy is None:
+            self.energy = local_energy(system, self.G)
+        return self.energy
+
+    def history_arrays(self):
+        """Historic wavefunctions and auxiliary field configurations.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Historic walker data. Empty if not stored.
+        """
+        if not self.history:
+            return []
+        fc = self.field_configs
+        return [self.phi_old, self.phi_init, self.phi_bp, fc.configs,
+                fc.cos_fac, fc.weight_fac]
 
     def get_buffer(self):
         """Get walker buffer for MPI communication
@@ -203,18 +312,13 @@ class SingleDetWalker(object):
         """
         buff = {
             'phi': self.phi,
-            'phi_old': self.phi_old,
-            'phi_init': self.phi_init,
-            'phi_bp': self.phi_bp,
             'weight': self.weight,
             'inv_ovlp': self.inv_ovlp,
             'G': self.G,
-            'overlap': self.ot,
+            'log_overlap': self.log_ot,
             'overlaps': self.ots,
-            'fields': self.field_configs.configs,
-            'cfacs': self.field_configs.cos_fac,
             'E_L': self.E_L,
-            'weight_fac': self.field_configs.weight_fac
+            'history': self.history_arrays()
         }
         return buff
 
@@ -226,16 +330,74 @@ class SingleDetWalker(object):
         buff : dict
             Relevant walker information for population control.
         """
-        self.phi = numpy.copy(buff['phi'])
-        self.phi_old = numpy.copy(buff['phi_old'])
-        self.phi_init = numpy.copy(buff['phi_init'])
-        self.phi_bp = numpy.copy(buff['phi_bp'])
-        self.inv_ovlp = numpy.copy(buff['inv_ovlp'])
-        self.G = numpy.copy(buff['G'])
+        numpy.copyto(self.phi, buff['phi'])
+        numpy.copyto(self.inv_ovlp[0], buff['inv_ovlp'][0])
+        numpy.copyto(self.inv_ovlp[1], buff['inv_ovlp'][1])
+        numpy.copyto(self.G, buff['G'])
         self.weight = buff['weight']
-        self.ot = buff['overlap']
+        self.log_ot = buff['log_overlap']
         self.E_L = buff['E_L']
-        self.ots = numpy.copy(buff['overlaps'])
-        self.field_configs.configs = numpy.copy(buff['fields'])
-        self.field_configs.cos_fac = numpy.copy(buff['cfacs'])
-        self.field_configs.weight_fac = numpy.copy(buff['weight_fac'])
+        numpy.copyto(self.ots, buff['overlaps'])
+        for (a, b) in zip(self.history_arrays(), buff['history']):
+            numpy.copyto(a, b)
+        self.invalidate()
+
+    def buffer_arrays(self):
+        """Walker data communicated during population control.
+
+        Only data which can't be cheaply recomputed is included.
+
+        Returns
+        -------
+        arrays : list of :class:`numpy.ndarray`
+            Walker data.
+        """
+        return [self.phi, self.ots] + self.history_arrays()
+
+    def buffer_layout(self):
+        """Construct layout of contiguous buffer for MPI communication.
+
+        Returns
+        -------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        """
+        return WalkerBuffer(self.buffer_arrays(), nscalars=4)
+
+    def pack(self, layout, buff):
+        """Pack walker into contiguous buffer for MPI communication.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to pack into.
+        """
+        layout.pack(buff, self.buffer_arrays(),
+                    (self.weight, self.log_ot.real, self.log_ot.imag,
+                     self.E_L))
+
+    def unpack(self, layout, buff, trial):
+        """Unpack walker from contiguous buffer following MPI communication.
+
+        The inverse overlap matrix and Green's function are rebuilt.
+
+        Parameters
+        ----------
+        layout : :class:`pauxy.walkers.buffer.WalkerBuffer`
+            Buffer layout.
+        buff : :class:`numpy.ndarray`
+            Buffer to unpack.
+        trial : object
+            Trial wavefunction object.
+        """
+        (weight, log_ot, phase, E_L) = layout.unpack(buff,
+                                                     self.buffer_arrays())
+        if not numpy.iscomplexobj(self.phi):
+            weight = weight.real
+        self.weight = weight
+        self.log_ot = complex(log_ot.real, phase.real)
+        self.E_L = E_L.real
+        self.inverse_overlap(trial.psi)
+        self.greens_function(trial)
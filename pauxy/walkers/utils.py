@@ -0,0 +1,83 @@
+import numpy
+import sys
+import warnings
+from pauxy.walkers.batch import WalkerBatch
+from pauxy.walkers.handler import Walkers, HierarchicalSchedule
+
+
+def get_walkers(system, trial, qmc, nprop_tot, nbp, verbose=False,
+                history=True):
+    """Wrapper to select walker container.
+
+    Parameters
+    ----------
+    system : class
+        System class.
+    trial : class
+        Trial wavefunction object.
+    qmc : :class:`pauxy.qmc.options.QMCOpts` class
+        QMC options.
+    nprop_tot : int
+        Total number of propagators to store for back propagation + itcf.
+    nbp : int
+        Number of back propagation steps.
+    verbose : bool
+        Print additional information.
+    history : bool
+        Store historic wavefunctions and auxiliary field configurations.
+
+    Returns
+    -------
+    psi : class
+        Walker container. See :ref:`pauxy.walkers.handler` or
+        :ref:`pauxy.walkers.batch`.
+    """
+    if qmc.spin_restricted:
+        nup = system.nup
+        closed_shell = (
+            system.nup == system.ndown and
+            trial.name != 'multi_determinant' and
+            numpy.allclose(trial.psi[:,:nup], trial.psi[:,nup:])
+        )
+        if not closed_shell:
+            warnings.warn('Spin restricted walkers require a closed shell '
+                          'system and RHF trial wavefunction. Exiting.')
+            sys.exit()
+        if system.name != 'Generic' or qmc.batched or history:
+            warnings.warn('Spin restricted walkers are only implemented for '
+                          'generic systems without batching, back '
+                          'propagation or ITCFs. Exiting.')
+            sys.exit()
+    if qmc.batched:
+        if trial.name == 'multi_determinant':
+            warnings.warn('Batched walkers require a single determinant trial '
+                          'wavefunction. Exiting.')
+            sys.exit()
+        psi = WalkerBatch(system, trial, qmc.nwalkers, nprop_tot, nbp, verbose,
+                          qmc.field_precision, qmc.field_scratch, history)
+    else:
+        psi = Walkers(system, trial, qmc.nwalkers, nprop_tot, nbp, verbose,
+                      qmc.field_precision, qmc.field_scratch, history,
+                      qmc.spin_restricted)
+    if (qmc.hierarchical_pop_control and
+            qmc.pop_control_method != 'comb'):
+        warnings.warn('Hierarchical population control is only implemented '
+                      'for the comb, ignoring for pop_control_method = %s.'
+                      %qmc.pop_control_method)
+    if qmc.pop_control_method == 'stochastic_reconfiguration':
+        psi.pop_control = psi.stochastic_reconfiguration
+    elif qmc.pop_control_method == 'split_join':
+        psi.split_join_window = qmc.split_join_window
+        psi.pop_control = psi.split_join
+    elif qmc.pop_control_method != 'comb':
+        warnings.warn('Unknown population control method: %s. Exiting.'
+                      %qmc.pop_control_method)
+        sys.exit()
+    elif qmc.hierarchical_pop_control:
+        if verbose:
+            print("# Using hierarchical population control.")
+        psi.schedule = HierarchicalSchedule(qmc.npop_control_internode,
+                                            qmc.internode_drift)
+        psi.pop_control = psi.hierarchical_comb
+
+    return psi
@@ -0,0 +1,64 @@
+import numpy
+import scipy.linalg
+from pauxy.utils.linalg import (
+    adjugate,
+    condition_estimate,
+    exponentiate_matrix,
+    sherman_morrison_batch
+)
+
+
+def random_matrices(shape, cplx=False):
+    A = numpy.random.random(shape) - 0.5
+    if cplx:
+        A = A + 1j*(numpy.random.random(shape)-0.5)
+    return A
+
+
+def test_sherman_morrison_batch():
+    numpy.random.seed(7)
+    (nmat, N) = (5, 6)
+    A = random_matrices((nmat,N,N), cplx=True) + 2*numpy.identity(N)
+    u = random_matrices((nmat,N), cplx=True)
+    vt = random_matrices((nmat,N), cplx=True)
+    Ainv = sherman_morrison_batch(numpy.linalg.inv(A), u, vt)
+    ref = numpy.linalg.inv(A + u[:,:,None]*vt[:,None,:])
+    numpy.testing.assert_allclose(Ainv, ref, atol=1e-12)
+    # Vectors common to all matrices.
+    Ainv = sherman_morrison_batch(numpy.linalg.inv(A), u[0], vt[0])
+    ref = numpy.linalg.inv(A + numpy.outer(u[0], vt[0]))
+    numpy.testing.assert_allclose(Ainv, ref, atol=1e-12)
+
+
+def test_exponentiate_matrix():
+    numpy.random.seed(7)
+    for scale in [0.1, 1.0, 10.0]:
+        M = scale * random_matrices((3,8,8), cplx=True)
+        ref = numpy.array([scipy.linalg.expm(m) for m in M])
+        expm = exponentiate_matrix(M, order=12)
+        numpy.testing.assert_allclose(expm, ref, rtol=1e-8, atol=1e-10)
+        expm = exponentiate_matrix(M[0], order=30, tol=1e-12)
+        numpy.testing.assert_allclose(expm, ref[0], rtol=1e-8, atol=1e-10)
+
+
+def test_adjugate():
+    numpy.random.seed(7)
+    for n in [1, 2, 3, 4]:
+        A = random_matrices((4,n,n), cplx=True)
+        ref = numpy.linalg.det(A)[:,None,None] * numpy.linalg.inv(A)
+        numpy.testing.assert_allclose(adjugate(A), ref, atol=1e-12)
+    # Well defined for singular matrices.
+    A = numpy.array([[1.0, 2.0], [2.0, 4.0]])
+    numpy.testing.assert_allclose(adjugate(A), [[4.0, -2.0], [-2.0, 1.0]])
+
+
+def test_condition_estimate():
+    numpy.random.seed(7)
+    A = random_matrices((4,16,5))
+    # Nearly linearly dependent columns of equal norm.
+    A[1,:,1] = A[1,:,0] + 1e-5*A[1,:,1]
+    A[1,:,1] *= numpy.linalg.norm(A[1,:,0]) / numpy.linalg.norm(A[1,:,1])
+    ref = numpy.linalg.cond(A)
+    numpy.testing.assert_allclose(condition_estimate(A), ref, rtol=1e-4)
+    assert condition_estimate(A[1]) > 1e4
+    assert condition_estimate(A[0,:,:0]) == 1.0
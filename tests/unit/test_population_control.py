@@ -0,0 +1,84 @@
+import numpy
+from pauxy.qmc.calc import FakeComm
+from pauxy.systems.hubbard import Hubbard
+from pauxy.trial_wavefunction.free_electron import FreeElectron
+from pauxy.walkers.handler import Walkers, comb_copies, split_join_moves
+
+
+def test_comb_copies():
+    numpy.random.seed(7)
+    comm = FakeComm()
+    nw = 20
+    for weights in [numpy.random.random(nw),
+                    numpy.random.random(nw)**8,
+                    numpy.concatenate((numpy.zeros(5),
+                                       numpy.random.random(nw-5))),
+                    numpy.ones(nw)]:
+        for i in range(10):
+            (ncopies, total) = comb_copies(comm, weights, nw)
+            # Walker number is conserved and dead walkers aren't copied.
+            assert numpy.sum(ncopies) == nw
+            assert numpy.all(ncopies[weights==0] == 0)
+            numpy.testing.assert_allclose(total, numpy.sum(weights))
+            # Each walker gets floor or ceil of its expected number of copies.
+            expected = nw * weights / total
+            assert numpy.all(ncopies >= numpy.floor(expected))
+            assert numpy.all(ncopies <= numpy.ceil(expected))
+
+
+def check_split_join(weights, window):
+    (copies, new) = split_join_moves(weights, window)
+    numpy.testing.assert_allclose(numpy.sum(new), numpy.sum(weights))
+    for (i, j) in copies:
+        assert new[i] == new[j]
+        numpy.testing.assert_allclose(new[i], 0.5*weights[i])
+    return (copies, new)
+
+
+def test_split_join_moves():
+    numpy.random.seed(7)
+    window = (0.5, 2.0)
+    # Free slots are used before joining light walkers.
+    weights = numpy.array([0.0, 0.0, 0.1, 0.2, 1.0, 1.0, 8.0, 5.0])
+    (copies, new) = check_split_join(weights, window)
+    assert copies == [(6, 0), (7, 1)]
+    numpy.testing.assert_allclose(new[2:4], weights[2:4])
+    # Light walkers are joined in pairs once free slots run out.
+    weights = numpy.array([0.0, 0.1, 0.2, 0.15, 0.25, 1.5, 9.0, 6.0, 5.0])
+    (copies, new) = check_split_join(weights, window)
+    assert [i for (i, j) in copies] == [6, 7, 8]
+    assert copies[0][1] == 0
+    for ((i, j), pair) in zip(copies[1:], [[1,3], [2,4]]):
+        assert j in pair
+        keep = pair[0] if j == pair[1] else pair[1]
+        numpy.testing.assert_allclose(new[keep], numpy.sum(weights[pair]))
+    # Heavy walkers are left alone if light walkers can't be paired.
+    weights = numpy.array([0.1, 1.0, 1.0, 1.0, 10.0])
+    (copies, new) = check_split_join(weights, (0.25, 2.0))
+    assert copies == []
+    numpy.testing.assert_allclose(new, weights)
+    # Only dead walkers.
+    weights = numpy.zeros(4)
+    (copies, new) = check_split_join(weights, window)
+    assert copies == []
+
+
+def test_stochastic_reconfiguration():
+    numpy.random.seed(7)
+    system = Hubbard({'name': 'Hubbard', 'nup': 2, 'ndown': 2, 't': 1.0,
+                      'U': 4.0, 'nx': 2, 'ny': 2, 'ktwist': [0, 0]}, 0.05)
+    trial = FreeElectron(system, True, {})
+    nw = 10
+    psi = Walkers(system, trial, nw, 0, 0, history=False)
+    comm = FakeComm()
+    log_factor = 0.0
+    for i in range(3):
+        weights = numpy.random.random(nw)
+        weights[:2] = 0.0
+        for (w, weight) in zip(psi.walkers, weights):
+            w.weight = weight
+        psi.stochastic_reconfiguration(comm, trial)
+        log_factor += numpy.log(numpy.mean(weights))
+        assert len(psi.walkers) == nw
+        numpy.testing.assert_allclose([w.weight for w in psi.walkers], 1.0)
+        numpy.testing.assert_allclose(psi.log_weight_factor, log_factor)